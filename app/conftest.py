@@ -1,7 +1,12 @@
 import pytest
+from django.conf import settings
+from django.core.cache import cache
 from pytest_factoryboy import register
 from rest_framework.test import APIClient
 
+from polls import idempotency
+from polls.authentication import clear_token_cache
+from polls.question_cache import question_cache
 from polls.tests.factories import PollsFactory
 from polls.tests.factories import QuestionsFactory
 from polls.tests.factories import AnswersFactory
@@ -11,6 +16,25 @@ register(QuestionsFactory)
 register(AnswersFactory)
 
 
+@pytest.fixture(scope='session')
+def django_db_modify_db_settings(django_db_modify_db_settings_parallel_suffix):
+    # Second connection to the test database, tests which route reads to a replica use it
+    settings.DATABASES['replica'] = dict(settings.DATABASES['default'], TEST={'MIRROR': 'default'})
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    question_cache.clear()
+    clear_token_cache()
+    idempotency.clear()
+    yield
+    cache.clear()
+    question_cache.clear()
+    clear_token_cache()
+    idempotency.clear()
+
+
 @pytest.fixture
 def api_client():
     return APIClient()
@@ -0,0 +1,9 @@
+# Gunicorn settings, see https://docs.gunicorn.org/en/stable/settings.html
+import multiprocessing
+import os
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+# `sync` for polling_system.wsgi:application, `uvicorn.workers.UvicornWorker` for polling_system.asgi:application
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "sync")
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 5))
@@ -44,6 +44,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'polls.metrics.MetricsMiddleware',
+    'polls.throttling.ConcurrencyLimitMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -53,6 +55,10 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Per-route latency, database queries and response size are collected by MetricsMiddleware
+# and exposed at /metrics (per process), `0` disables collection and Server-Timing header
+METRICS_ENABLED = bool(int(os.environ.get("METRICS_ENABLED", 1)))
+
 ROOT_URLCONF = 'polling_system.urls'
 
 TEMPLATES = [
@@ -73,6 +79,20 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'polling_system.wsgi.application'
 
+ASGI_APPLICATION = 'polling_system.asgi.application'
+
+# Answers submitted to async endpoint are saved in batches of given size or after given delay (seconds)
+ASYNC_ANSWERS_BATCH_SIZE = int(os.environ.get("ASYNC_ANSWERS_BATCH_SIZE", 100))
+ASYNC_ANSWERS_BATCH_DELAY = float(os.environ.get("ASYNC_ANSWERS_BATCH_DELAY", 0.01))
+
+# Upper limit for the number of answers in one POST /answers/bulk/ request (saved in one transaction)
+ANSWERS_BULK_MAX_SIZE = int(os.environ.get("ANSWERS_BULK_MAX_SIZE", 500))
+
+# `direct` - POST /answers/ saves answer, `spool` - answer is validated and appended to local spool
+# (SQLite file at ANSWERS_SPOOL_PATH), `manage.py drain_answers` saves spooled answers in batches
+ANSWERS_INGEST_MODE = os.environ.get("ANSWERS_INGEST_MODE", "direct")
+ANSWERS_SPOOL_PATH = os.environ.get("ANSWERS_SPOOL_PATH", os.path.join(BASE_DIR, "answers_spool.sqlite3"))
+
 
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
@@ -85,9 +105,53 @@ DATABASES = {
         "PASSWORD": os.environ.get("SQL_PASSWORD", "password"),
         "HOST": os.environ.get("SQL_HOST", "localhost"),
         "PORT": os.environ.get("SQL_PORT", "5432"),
+        # Keep connection open between requests for given number of seconds (None - unlimited)
+        "CONN_MAX_AGE": None if os.environ.get("SQL_CONN_MAX_AGE") == "none"
+        else int(os.environ.get("SQL_CONN_MAX_AGE", 0)),
+        # Server-side cursors don't work behind pooler in transaction mode (e.g. PgBouncer)
+        "DISABLE_SERVER_SIDE_CURSORS": bool(int(os.environ.get("SQL_TRANSACTION_POOLER", 0))),
+    }
+}
+
+# Read replicas: hosts of PostgreSQL replicas (database files for SQLite) separated by space,
+# safe-method requests of the API read from a random replica
+DATABASE_REPLICAS = []
+for number, replica in enumerate(os.environ.get("SQL_REPLICAS", "").split(), start=1):
+    replica_key = "NAME" if DATABASES["default"]["ENGINE"].endswith("sqlite3") else "HOST"
+    DATABASES[f"replica{number}"] = dict(DATABASES["default"], **{replica_key: replica, "TEST": {"MIRROR": "default"}})
+    DATABASE_REPLICAS.append(f"replica{number}")
+
+DATABASE_ROUTERS = ["polls.db_routers.ReplicaRouter"]
+
+# Client reads from the primary for given number of seconds after its write
+REPLICA_PIN_SECONDS = int(os.environ.get("SQL_REPLICA_PIN_SECONDS", 5))
+
+# Check that persistent connection is alive at the start of each request
+SQL_CONN_HEALTH_CHECKS = bool(int(os.environ.get("SQL_CONN_HEALTH_CHECKS", 0)))
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.1/topics/cache/
+# Local-memory cache by default, set CACHE_BACKEND and CACHE_LOCATION to use shared
+# one (e.g. django.core.cache.backends.memcached.MemcachedCache and memcached:11211).
+
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.environ.get("CACHE_LOCATION", ""),
     }
 }
 
+# Lifetime (seconds) of cached responses same for all non-staff users (e.g. list of active polls), they are
+# invalidated on changes, but with local memory cache other processes see the changes only when they expire
+CACHED_RESPONSE_TTL = int(os.environ.get(
+    "CACHED_RESPONSE_TTL", 60 if CACHES["default"]["BACKEND"].endswith("LocMemCache") else 24 * 60 * 60
+))
+
+# Per-process cache of question metadata used by answer validation: max number of questions and TTL (seconds)
+QUESTION_CACHE_SIZE = int(os.environ.get("QUESTION_CACHE_SIZE", 10000))
+QUESTION_CACHE_TTL = int(os.environ.get("QUESTION_CACHE_TTL", 300))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -109,14 +173,72 @@ AUTH_PASSWORD_VALIDATORS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'polls.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_FILTER_BACKENDS': (
         'django_filters.rest_framework.DjangoFilterBackend',
     ),
+    # JSON is rendered and parsed by orjson if it's installed, output is the same as of JSONRenderer
+    'DEFAULT_RENDERER_CLASSES': (
+        'polls.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'polls.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
+    'DEFAULT_THROTTLE_CLASSES': (
+        'polls.throttling.UserIdRateThrottle',
+        'polls.throttling.IPRateThrottle',
+    ),
+    # Client IP is taken from X-Forwarded-For set by given number of proxies (nginx)
+    'NUM_PROXIES': int(os.environ.get("NUM_PROXIES", 1)),
+    'DEFAULT_PAGINATION_CLASS': 'polls.pagination.IdCursorPagination',
+    'PAGE_SIZE': int(os.environ.get("API_PAGE_SIZE", 100)),
     'TEST_REQUEST_DEFAULT_FORMAT': 'json'
 }
 
+# Token-bucket rate limits by route name and client (`user_id` - answering user, `ip` - client address):
+# (requests per second, burst), `0` disables them (e.g. for benchmarks)
+THROTTLE_RATES = {
+    "answers-list": {"user_id": (2, 20), "ip": (50, 200)},
+    "answers-async": {"user_id": (2, 20), "ip": (50, 200)},
+    "answers-bulk": {"user_id": (0.2, 5), "ip": (5, 20)},
+    "token_obtain_pair": {"ip": (1, 10)},
+} if bool(int(os.environ.get("THROTTLE_ENABLED", 1))) else {}
+
+# Maximal number of concurrent requests of a route, excess requests get 429 with Retry-After (seconds)
+# before they queue for database connections. Requests in progress are counted in the default cache
+# (shared by workers only with shared backend), a request is counted for at most two windows of
+# CONCURRENCY_COUNTER_TTL seconds, so requests of killed workers don't stay counted.
+CONCURRENCY_LIMITS = {
+    "answers-list": int(os.environ.get("ANSWERS_CONCURRENCY_LIMIT", 32)),
+    "answers-async": int(os.environ.get("ANSWERS_ASYNC_CONCURRENCY_LIMIT", 1000)),
+    "answers-bulk": int(os.environ.get("ANSWERS_BULK_CONCURRENCY_LIMIT", 8)),
+    "token_obtain_pair": int(os.environ.get("TOKEN_CONCURRENCY_LIMIT", 8)),
+}
+CONCURRENCY_RETRY_AFTER = int(os.environ.get("CONCURRENCY_RETRY_AFTER", 1))
+CONCURRENCY_COUNTER_TTL = int(os.environ.get("CONCURRENCY_COUNTER_TTL", 60))
+
+# Responses to POST /answers/ with Idempotency-Key header are replayed for retries with the same key
+# for given number of seconds, recent keys are also kept in per-process cache of given size.
+# Concurrent retries get 409 while the first request is in progress, at most IDEMPOTENCY_PENDING_TTL seconds
+IDEMPOTENCY_KEY_TTL = int(os.environ.get("IDEMPOTENCY_KEY_TTL", 24 * 60 * 60))
+IDEMPOTENCY_PENDING_TTL = int(os.environ.get("IDEMPOTENCY_PENDING_TTL", 60))
+IDEMPOTENCY_CACHE_SIZE = int(os.environ.get("IDEMPOTENCY_CACHE_SIZE", 10000))
+
+# Verified tokens are kept in per-process cache of given size until they expire,
+# users are kept in default cache for given TTL (seconds)
+JWT_TOKEN_CACHE_SIZE = int(os.environ.get("JWT_TOKEN_CACHE_SIZE", 10000))
+JWT_USER_CACHE_TTL = int(os.environ.get("JWT_USER_CACHE_TTL", 30))
+# Build user from token claims (`user_id`, `is_staff`) without database query,
+# changes of user (e.g. deactivation) take effect when issued tokens expire
+JWT_STATELESS_USER = bool(int(os.environ.get("JWT_STATELESS_USER", 0)))
+
+# Upper limit for `page_size` query parameter of list endpoints
+API_MAX_PAGE_SIZE = int(os.environ.get("API_MAX_PAGE_SIZE", 1000))
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/2.2/topics/i18n/
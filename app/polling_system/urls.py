@@ -9,13 +9,16 @@ from rest_framework_simplejwt import views as jwt_views
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 
+from polls import metrics
 from polls import views
+from polls.serializers import ClaimsTokenObtainPairSerializer
 
 
 router = routers.DefaultRouter()
 
 router.register(r'polls', views.PollsViewSet, basename='polls')
 router.register(r'questions', views.QuestionsViewSet, basename='questions')
+router.register(r'options', views.OptionsViewSet, basename='options')
 router.register(r'answers', views.AnswerViewSet, basename='answers')
 
 schema_view = get_schema_view(
@@ -38,7 +41,7 @@ urlpatterns = [
 
     path('admin/', admin.site.urls),
     path('token/',
-         jwt_views.TokenObtainPairView.as_view(),
+         jwt_views.TokenObtainPairView.as_view(serializer_class=ClaimsTokenObtainPairSerializer),
          name='token_obtain_pair'),
     path('token/refresh/',
          jwt_views.TokenRefreshView.as_view(),
@@ -46,6 +49,8 @@ urlpatterns = [
     path('token/verify/',
          jwt_views.TokenVerifyView.as_view(),
          name='token_verify'),
+    path('answers/async/', views.submit_answer, name='answers-async'),
+    path('metrics', metrics.metrics, name='metrics'),
 ]
 urlpatterns += router.urls
 
@@ -0,0 +1,51 @@
+"""
+Activation of polls at date boundaries.
+
+`Poll.is_active` of all polls is flipped at once at the start of a date in TIME_ZONE, so active polls
+are looked up by the indexed flag. With shared cache all workers switch to the new list together,
+when its cached version is invalidated, instead of each one at the date boundary of its own clock.
+"""
+from datetime import datetime as dt
+from datetime import timedelta as td
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models import Q
+from django.test import RequestFactory
+from django.utils import timezone
+
+from . import caching
+from .models import Poll
+from .views import PollsViewSet
+
+
+def update_active_polls(today=None):
+    """
+    Activates polls started and deactivates polls ended by the date (today by default), bumps versions
+    of changed polls and invalidates list of active polls. Returns pks of activated and deactivated polls.
+    """
+    today = today or timezone.localdate()
+    opened = Q(start_date__lte=today) & Q(end_date__gte=today)
+    with transaction.atomic():
+        activated = list(Poll.objects.filter(opened, is_active=False).values_list('pk', flat=True))
+        deactivated = list(Poll.objects.filter(~opened, is_active=True).values_list('pk', flat=True))
+        Poll.objects.filter(pk__in=activated).update(is_active=True, version=F('version') + 1)
+        Poll.objects.filter(pk__in=deactivated).update(is_active=False, version=F('version') + 1)
+    if activated or deactivated:
+        caching.invalidate(caching.ACTIVE_POLLS)
+    return activated, deactivated
+
+
+def warm_active_polls(host):
+    """
+    Renders list of active polls for non-staff users into cache, so the first requests after
+    the switch don't build it in every worker at once. Returns status code of the response.
+    """
+    request = RequestFactory().get('/polls/', HTTP_HOST=host, HTTP_ACCEPT='application/json')
+    return PollsViewSet.as_view({'get': 'list'})(request).status_code
+
+
+def seconds_to_next_date():
+    now = timezone.localtime()
+    boundary = timezone.make_aware(dt.combine(now.date() + td(days=1), dt.min.time()))
+    return (boundary - now).total_seconds()
@@ -0,0 +1,62 @@
+"""
+Archival of answers of closed polls.
+
+Answers of a poll ended in the past are moved to compact `ArchivedAnswer` table and its results
+are frozen in `PollArchive`, so `Answer` table and its indexes hold only answers of open polls.
+Tallies and statistics of archived polls are left as is.
+"""
+from django.db.models import Prefetch
+from django.db.models import Q
+
+from .models import Answer
+from .models import ArchivedAnswer
+from .models import OptionTally
+from .models import Poll
+from .models import PollArchive
+from .serializers import QuestionResultsSerializer
+
+ARCHIVE_BATCH_SIZE = 2000
+
+
+def poll_results(poll):
+    """
+    Returns results of the poll computed from tallies: questions with count of responses and selected options.
+    """
+    questions = poll.questions.select_related('tally').prefetch_related(
+        Prefetch('option_tallies', queryset=OptionTally.objects.order_by('option'))
+    )
+    return QuestionResultsSerializer(questions, many=True).data
+
+
+def closed_polls(before):
+    """
+    Returns polls ended before the date which are not archived yet or got answers after archival.
+    """
+    return Poll.objects.filter(end_date__lt=before).filter(
+        Q(archive__isnull=True) | Q(questions__answers__isnull=False)
+    ).distinct().order_by('pk')
+
+
+def archive_poll(poll, batch_size=ARCHIVE_BATCH_SIZE):
+    """
+    Moves answers of the poll to `ArchivedAnswer` table in batches and freezes its results.
+    Returns number of moved answers. Has to be called in transaction.
+    """
+    answers = Answer.objects.filter(question__poll=poll).order_by('pk')
+    moved = 0
+    while True:
+        rows = list(answers.values_list('pk', 'user_id', 'question', 'answer', 'digest')[:batch_size])
+        if not rows:
+            break
+        ArchivedAnswer.objects.bulk_create([
+            ArchivedAnswer(id=pk, poll=poll, user_id=user_id, question_id=question, answer=answer, digest=digest)
+            for pk, user_id, question, answer, digest in rows
+        ])
+        Answer.objects.filter(pk__in=[row[0] for row in rows]).delete()
+        moved += len(rows)
+
+    archive = PollArchive.objects.filter(poll=poll).first() or PollArchive(poll=poll)
+    archive.answers += moved
+    archive.results = poll_results(poll)
+    archive.save()
+    return moved
@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+from .lru import LRUCache
+
+_tokens = LRUCache(settings.JWT_TOKEN_CACHE_SIZE)
+
+
+def user_cache_key(user_id):
+    return f'jwt_user:{user_id}'
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication which keeps verified tokens in per-process cache until they expire
+    and users in the default cache for `JWT_USER_CACHE_TTL` seconds. Cached users don't include
+    password hash, it's deferred in the user built from the cache. With `JWT_STATELESS_USER`
+    user is built from token claims (`user_id`, `is_staff`) without database query.
+    """
+
+    def get_validated_token(self, raw_token):
+        validated_token = _tokens.get(raw_token)
+        if validated_token is None:
+            validated_token = super().get_validated_token(raw_token)
+            _tokens.set(raw_token, validated_token, validated_token['exp'])
+        return validated_token
+
+    def get_user(self, validated_token):
+        if settings.JWT_STATELESS_USER:
+            return TokenUser(validated_token)
+        key = user_cache_key(validated_token.get(api_settings.USER_ID_CLAIM))
+        user_model = get_user_model()
+        fields = cached_user_fields(user_model)
+        values = cache.get(key)
+        if values is not None:
+            return user_model.from_db(DEFAULT_DB_ALIAS, fields, values)
+        user = super().get_user(validated_token)
+        cache.set(key, [getattr(user, name) for name in fields], settings.JWT_USER_CACHE_TTL)
+        return user
+
+
+def cached_user_fields(user_model):
+    return [field.attname for field in user_model._meta.concrete_fields if field.name != 'password']
+
+
+def clear_token_cache():
+    _tokens.clear()
@@ -0,0 +1,127 @@
+"""
+Saving of answers submitted by separate requests in batches.
+
+`save_answers` validates and writes a batch with `AnswerListSerializer` (one query for
+questions, one bulk insert) and returns result of each item, so invalid items don't
+fail the rest of the batch, repeated submission of the same answer returns the stored one
+as `POST /answers/` does. `AnswerBatcher` collects answers of concurrent async
+requests and saves them by one `sync_to_async` call per batch.
+"""
+import asyncio
+import weakref
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from rest_framework import serializers
+from rest_framework import status
+from rest_framework.settings import api_settings
+
+from .models import Answer
+from .serializers import ALREADY_ANSWERED
+from .serializers import AnswerSerializer
+
+
+def save_answers(items):
+    """
+    Saves valid answers of `items` (list of dicts) and returns list of (status code, data)
+    for each item: created answer or validation errors.
+    """
+    results = [None] * len(items)
+    indexes = list(range(len(items)))
+    while indexes:
+        serializer = AnswerSerializer(data=[items[index] for index in indexes], many=True)
+        try:
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+        except serializers.ValidationError as exc:
+            errors = exc.detail
+            if not isinstance(errors, list) or not any(errors):
+                raise
+        else:
+            for index, data in zip(indexes, serializer.data):
+                results[index] = (status.HTTP_201_CREATED, data)
+            break
+        # Report invalid items and retry the rest of batch
+        for index, error in zip(indexes, errors):
+            if error:
+                results[index] = (status.HTTP_400_BAD_REQUEST, error)
+        indexes = [index for index, error in zip(indexes, errors) if not error]
+    replay_duplicates(items, results)
+    return results
+
+
+def replay_duplicates(items, results):
+    # Items rejected as already answered get the stored answer with 200 if it's the same
+    duplicates = [
+        index for index, (status_code, error) in enumerate(results)
+        if status_code == status.HTTP_400_BAD_REQUEST
+        and error.get(api_settings.NON_FIELD_ERRORS_KEY) == [ALREADY_ANSWERED]
+    ]
+    if not duplicates:
+        return
+    keys = {index: (int(items[index]['user_id']), int(items[index]['question'])) for index in duplicates}
+    stored = {
+        (answer.user_id, answer.question_id): answer
+        for answer in Answer.objects.filter(
+            user_id__in={user_id for user_id, _ in keys.values()},
+            question__in={question for _, question in keys.values()}
+        )
+    }
+    for index, key in keys.items():
+        answer = stored.get(key)
+        if answer is not None and answer.answer == items[index]['answer']:
+            results[index] = (status.HTTP_200_OK, AnswerSerializer(answer).data)
+
+
+class AnswerBatcher:
+    """
+    Collects answers of concurrent requests until `ASYNC_ANSWERS_BATCH_SIZE` answers are
+    pending or `ASYNC_ANSWERS_BATCH_DELAY` seconds passed, then saves them in one batch.
+    """
+    _instances = weakref.WeakKeyDictionary()
+
+    def __init__(self):
+        self._pending = []
+        self._timer = None
+
+    @classmethod
+    def get(cls):
+        """
+        Returns batcher of the running event loop.
+        """
+        loop = asyncio.get_running_loop()
+        if loop not in cls._instances:
+            cls._instances[loop] = cls()
+        return cls._instances[loop]
+
+    async def submit(self, item):
+        """
+        Adds answer (dict) to the current batch and waits for its (status code, data).
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= settings.ASYNC_ANSWERS_BATCH_SIZE:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(settings.ASYNC_ANSWERS_BATCH_DELAY, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            asyncio.ensure_future(self._save(batch))
+
+    async def _save(self, batch):
+        try:
+            results = await sync_to_async(save_answers)([item for item, _ in batch])
+        except Exception as exc:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+        else:
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
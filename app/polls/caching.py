@@ -0,0 +1,116 @@
+"""
+Cache of rendered responses which are the same for all non-staff users.
+
+Each cached list has a version (timestamp of last invalidation) which is a part of
+the cache key, so invalidation is a single `cache.set` and works with any backend
+configured in `CACHES`.
+
+Poll detail and its questions are revalidated by `ETag` computed from `Poll.version`
+(one lookup by primary key) without rendering the response.
+
+Only JSON responses are cached and revalidated, keyed by scheme, host and full path, because
+absolute links differ by host and the browsable API renders user-specific markup.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import F
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.utils.http import quote_etag
+from rest_framework.renderers import JSONRenderer
+
+from . import db_routers
+from .models import Poll
+
+ACTIVE_POLLS = 'active_polls'
+
+
+# Versions without timeout are kept until invalidation, names created per object should set timeout
+def get_version(name, timeout=None):
+    return cache.get_or_set(f'{name}:version', time.time, timeout=timeout)
+
+
+def invalidate(*names, timeout=None):
+    now = time.time()
+    cache.set_many({f'{name}:version': now for name in names}, timeout=timeout)
+
+
+def variant(request):
+    """
+    Returns key part of the response variant of the request, None if the response isn't JSON.
+    """
+    if not isinstance(request.accepted_renderer, JSONRenderer):
+        return None
+    return f'{request.accepted_media_type}:{request.scheme}://{request.get_host()}{request.get_full_path()}'
+
+
+def cached_response(view, request, name, build):
+    """
+    Returns response rendered by `build()` from cache. The content is cached until
+    invalidation of `name` or for `CACHED_RESPONSE_TTL` seconds, `ETag` and `Last-Modified`
+    headers allow client to revalidate it with 304 response.
+    """
+    request_variant = variant(request)
+    if request_variant is None:
+        return build()
+    version = get_version(name)
+    key = f'{name}:{version}:{request_variant}'
+    entry = cache.get(key)
+    if entry is None:
+        # Cached content is built from the primary, lagging replica could cache stale data
+        with db_routers.primary():
+            response = view.finalize_response(request, build())
+        response.render()
+        if response.status_code != 200:
+            return response
+        entry = (response.content, response['Content-Type'])
+        cache.set(key, entry, timeout=settings.CACHED_RESPONSE_TTL)
+    content, content_type = entry
+    etag = quote_etag(hashlib.md5(content).hexdigest())
+    # Content is changed only by invalidation
+    last_modified = version
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = HttpResponse(content, content_type=content_type)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+def get_poll_version(pk, polls=None):
+    """
+    Returns version of the poll among `polls` (all polls by default), None if there is no such poll.
+    The version is read from the primary by primary key, so writes of every worker are seen at once.
+    """
+    polls = Poll.objects.all() if polls is None else polls
+    return polls.using(DEFAULT_DB_ALIAS).filter(pk=pk).values_list('version', flat=True).first()
+
+
+def bump_poll_version(pk):
+    Poll.objects.filter(pk=pk).update(version=F('version') + 1)
+
+
+def conditional_response(request, poll, build, polls=None):
+    """
+    Returns 304 response if `If-None-Match` matches `ETag` of the current version of `poll` (pk),
+    otherwise response of `build()` with `ETag` header. Poll not visible in `polls` is never
+    revalidated, so `build()` responds to it. The version is also bumped when the poll becomes
+    active or inactive.
+    """
+    request_variant = variant(request)
+    version = get_poll_version(poll, polls) if request_variant and str(poll).isdigit() else None
+    if version is None:
+        return build()
+    etag = quote_etag(hashlib.md5(f'{poll}:{version}:{request_variant}'.encode()).hexdigest())
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = build()
+        if response.status_code != 200:
+            return response
+    response['ETag'] = etag
+    return response
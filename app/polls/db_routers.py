@@ -0,0 +1,57 @@
+"""
+Routing of reads to replica databases.
+
+Views set `use_replica` for requests which may read from replicas (see `ReplicaReadMixin`),
+other queries and all writes go to the primary (`default`) database. Client which has written
+recently is pinned to the primary, so it reads its own writes despite replication lag.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+use_replica = ContextVar('use_replica', default=False)
+
+
+def read_database():
+    """
+    Returns alias of database for reads in the current context.
+    """
+    if use_replica.get() and settings.DATABASE_REPLICAS:
+        return random.choice(settings.DATABASE_REPLICAS)
+    return DEFAULT_DB_ALIAS
+
+
+@contextmanager
+def primary():
+    """
+    Routes reads in the block to the primary, e.g. for data which is cached after invalidation.
+    """
+    token = use_replica.set(False)
+    try:
+        yield
+    finally:
+        use_replica.reset(token)
+
+
+def pin(keys):
+    cache.set_many({f'replica_pin:{key}': True for key in keys}, timeout=settings.REPLICA_PIN_SECONDS)
+
+
+def is_pinned(keys):
+    return bool(cache.get_many([f'replica_pin:{key}' for key in keys]))
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        return read_database()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
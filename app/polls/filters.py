@@ -1,4 +1,7 @@
 from django_filters import FilterSet
+from django_filters import NumberFilter
+from polls.models import Answer
+from polls.models import Option
 from polls.models import Question
 
 
@@ -7,3 +10,18 @@ class QuestionFilter(FilterSet):
     class Meta:
         model = Question
         fields = ['poll']
+
+
+class OptionFilter(FilterSet):
+
+    class Meta:
+        model = Option
+        fields = ['question']
+
+
+class AnswerFilter(FilterSet):
+    poll = NumberFilter(field_name='question__poll')
+
+    class Meta:
+        model = Answer
+        fields = ['user_id', 'question', 'poll']
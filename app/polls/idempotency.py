@@ -0,0 +1,117 @@
+"""
+Replay of responses to requests with `Idempotency-Key` header.
+
+Successful response of the first request is stored in per-process LRU cache and in the default
+cache for `IDEMPOTENCY_KEY_TTL` seconds, so retry with the same key gets the stored response
+without touching the database. The key can't be reused for a request with different data.
+Keys are scoped by client (user or IP address), and a key is marked pending in the default cache
+while its first request is in progress, so concurrent retries get 409 instead of running it again.
+"""
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+from .lru import LRUCache
+from .throttling import IPRateThrottle
+from .throttling import UserIdRateThrottle
+
+HEADER = 'HTTP_IDEMPOTENCY_KEY'
+MAX_KEY_LENGTH = 255
+# Response headers which are stored with the response
+STORED_HEADERS = ('Location',)
+# Value of the key while its first request is in progress
+PENDING = 'pending'
+
+_recent = LRUCache(settings.IDEMPOTENCY_CACHE_SIZE)
+
+
+def fingerprint(request, data):
+    data = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.md5(f'{request.method}:{request.path}:{data}'.encode()).hexdigest()
+
+
+# User of the answers (the first one of bulk request) or authenticated user, IP address otherwise
+def client(request, data):
+    return UserIdRateThrottle().get_client(request, data) or f'ip:{IPRateThrottle().get_ident(request)}'
+
+
+def clear():
+    _recent.clear()
+
+
+def replay(request, respond):
+    """
+    Returns stored response for repeated `Idempotency-Key` of the request or response of `respond()`,
+    which is stored if it's successful.
+    """
+    cache_key, request_fingerprint, stored = lookup(request, request.data)
+    if cache_key is None:
+        return respond()
+    if stored is not None:
+        status_code, data, headers = stored_result(stored, request_fingerprint)
+        return Response(data, status=status_code, headers=headers)
+    try:
+        response = respond()
+    except Exception:
+        release(cache_key)
+        raise
+    headers = {name: response[name] for name in STORED_HEADERS if response.has_header(name)}
+    store(cache_key, request_fingerprint, response.status_code, response.data, headers)
+    return response
+
+
+def lookup(request, data):
+    """
+    Returns (cache key, fingerprint, stored) for `Idempotency-Key` of the request with parsed body `data`,
+    cache key is None if the request has no valid key. Stored is None if the key is new, then the key
+    is marked pending and the request has to be finished by `store` or `release`.
+    """
+    key = request.META.get(HEADER)
+    if not key or len(key) > MAX_KEY_LENGTH:
+        return None, None, None
+    cache_key = f'idempotency:{request.path}:{client(request, data)}:{key}'
+    request_fingerprint = fingerprint(request, data)
+    stored = _recent.get(cache_key)
+    if stored is None and not cache.add(cache_key, PENDING, timeout=settings.IDEMPOTENCY_PENDING_TTL):
+        stored = cache.get(cache_key)
+    return cache_key, request_fingerprint, stored
+
+
+def stored_result(stored, request_fingerprint):
+    """
+    Returns (status code, data, headers) of response to the request with key found by `lookup`.
+    """
+    if stored == PENDING:
+        return (
+            status.HTTP_409_CONFLICT, {'detail': 'Request with the same Idempotency-Key is in progress'},
+            {'Retry-After': '1'}
+        )
+    stored_fingerprint, status_code, data, headers = stored
+    if stored_fingerprint != request_fingerprint:
+        return (
+            status.HTTP_422_UNPROCESSABLE_ENTITY,
+            {'detail': 'Idempotency-Key has been used for a request with different data'}, {}
+        )
+    return status_code, data, {**headers, 'Idempotent-Replayed': 'true'}
+
+
+def store(cache_key, request_fingerprint, status_code, data, headers):
+    """
+    Stores successful response of the request with pending key, releases the key otherwise.
+    """
+    if not status.is_success(status_code):
+        # Failed request can be retried with the same key
+        release(cache_key)
+        return
+    stored = (request_fingerprint, status_code, data, headers)
+    _recent.set(cache_key, stored, time.time() + settings.IDEMPOTENCY_KEY_TTL)
+    cache.set(cache_key, stored, timeout=settings.IDEMPOTENCY_KEY_TTL)
+
+
+def release(cache_key):
+    cache.delete(cache_key)
@@ -0,0 +1,35 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from polls import activation
+
+
+class Command(BaseCommand):
+    help = 'Activates polls started and deactivates polls ended today and warms cache of active polls'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep running and repeat at the start of each date')
+        parser.add_argument(
+            '--host', default=settings.ALLOWED_HOSTS[0],
+            help='Host of requests served by warmed responses (as sent by proxy), the first of ALLOWED_HOSTS by default'
+        )
+
+    def handle(self, *args, **options):
+        if settings.CACHES['default']['BACKEND'].endswith('LocMemCache'):
+            self.stderr.write(
+                'Local memory cache is not shared with web workers, they see changed polls when cached list '
+                'of active polls expires (CACHED_RESPONSE_TTL), set CACHE_BACKEND to shared one'
+            )
+        while True:
+            activated, deactivated = activation.update_active_polls()
+            activation.warm_active_polls(options['host'])
+            self.stdout.write(
+                f'{timezone.localdate()}: activated {len(activated)} polls, deactivated {len(deactivated)} polls'
+            )
+            if not options['loop']:
+                break
+            # Sleep a bit past the boundary, so the next run sees the new date
+            time.sleep(activation.seconds_to_next_date() + 1)
@@ -0,0 +1,36 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from polls import archival
+from polls.question_cache import question_cache
+
+
+class Command(BaseCommand):
+    help = 'Moves answers of closed polls to archive table and freezes their results'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--before', type=date.fromisoformat, default=None,
+            help='Archive polls ended before the date (YYYY-MM-DD), today by default'
+        )
+        parser.add_argument('--batch-size', type=int, default=archival.ARCHIVE_BATCH_SIZE, help='Answers moved at once')
+        parser.add_argument('--dry-run', action='store_true', help='Only list polls to archive')
+
+    def handle(self, *args, **options):
+        polls = archival.closed_polls(options['before'] or timezone.localdate())
+        archived = 0
+        for poll in polls:
+            if options['dry_run']:
+                self.stdout.write(f'Poll #{poll.pk} {poll.title} ended {poll.end_date}')
+                continue
+            # Each poll is moved in its own transaction, so archival can be interrupted and resumed
+            with transaction.atomic():
+                moved = archival.archive_poll(poll, options['batch_size'])
+            question_cache.clear()
+            archived += 1
+            self.stdout.write(f'Poll #{poll.pk}: archived {moved} answers')
+        if not options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f'Archived {archived} polls'))
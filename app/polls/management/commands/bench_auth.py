@@ -0,0 +1,46 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import RequestFactory
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from polls.authentication import CachedJWTAuthentication
+from polls.authentication import clear_token_cache
+from polls.serializers import ClaimsTokenObtainPairSerializer
+
+
+class Command(BaseCommand):
+    help = 'Measures authentication overhead per request of JWT authentication classes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=10000, help='Number of authenticated requests')
+        parser.add_argument('--username', default=None, help='User to authenticate, the first user by default')
+
+    def handle(self, *args, **options):
+        users = get_user_model().objects.order_by('pk')
+        user = users.get(username=options['username']) if options['username'] else users.first()
+        if user is None:
+            self.stderr.write('There are no users, create one with createsuperuser command')
+            return
+        token = ClaimsTokenObtainPairSerializer.get_token(user).access_token
+        request = RequestFactory().get('/polls/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        modes = [
+            ('JWTAuthentication', JWTAuthentication(), False),
+            ('CachedJWTAuthentication', CachedJWTAuthentication(), False),
+            ('CachedJWTAuthentication (stateless)', CachedJWTAuthentication(), True),
+        ]
+        for name, authentication, stateless in modes:
+            clear_token_cache()
+            with override_settings(JWT_STATELESS_USER=stateless), CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                for _ in range(options['requests']):
+                    authentication.authenticate(request)
+                elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f'{name}: {elapsed / options["requests"] * 1e6:.1f} us/request, '
+                f'{len(queries) / options["requests"]:.3f} queries/request'
+            )
@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from rest_framework.renderers import JSONRenderer
+
+from polls.models import Answer
+from polls.renderers import FastJSONRenderer
+from polls.renderers import orjson
+from polls.serializers import AnswerSerializer
+
+
+class Command(BaseCommand):
+    help = 'Compares rendering of answer list by serializer with JSONRenderer and by values() with FastJSONRenderer'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--answers', type=int, default=1000, help='Number of answers in the list')
+        parser.add_argument('--repeat', type=int, default=20, help='Number of runs to average time')
+
+    def handle(self, *args, **options):
+        queryset = Answer.objects.order_by('id')[:options['answers']]
+        if not queryset.exists():
+            raise CommandError('There are no answers, seed database with seed_data command')
+        if orjson is None:
+            self.stderr.write('orjson is not installed, FastJSONRenderer falls back to JSONRenderer')
+        fields = AnswerSerializer.Meta.fields
+        modes = [
+            ('serializer + JSONRenderer', JSONRenderer, lambda: AnswerSerializer(queryset, many=True).data),
+            ('serializer + FastJSONRenderer', FastJSONRenderer, lambda: AnswerSerializer(queryset, many=True).data),
+            ('values() + JSONRenderer', JSONRenderer, lambda: list(queryset.values(*fields))),
+            ('values() + FastJSONRenderer', FastJSONRenderer, lambda: list(queryset.values(*fields))),
+        ]
+        outputs = set()
+        baseline = None
+        for name, renderer_class, build in modes:
+            renderer = renderer_class()
+            outputs.add(renderer.render(build()))
+            started = time.perf_counter()
+            for _ in range(options['repeat']):
+                renderer.render(build())
+            elapsed = (time.perf_counter() - started) / options['repeat']
+            baseline = baseline or elapsed
+            self.stdout.write(f'{name}: {elapsed * 1000:.2f} ms, x{baseline / elapsed:.1f}')
+        if len(outputs) != 1:
+            raise CommandError('Outputs differ')
+        self.stdout.write(self.style.SUCCESS('Outputs are identical'))
@@ -0,0 +1,169 @@
+import itertools
+import json
+import random
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import requests
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db.models import Max
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from polls.models import Answer
+from polls.models import Question
+from polls.serializers import ClaimsTokenObtainPairSerializer
+
+
+def percentile(values, percent):
+    """
+    Returns percentile of sorted values by nearest rank.
+    """
+    if not values:
+        return None
+    return values[min(len(values) - 1, max(0, round(percent / 100 * len(values)) - 1))]
+
+
+class Command(BaseCommand):
+    help = (
+        'Runs load scenarios (poll listing, question fetch, answer submit, admin answer listing) against '
+        'running server and reports requests/sec, latency percentiles and database queries per request'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://localhost:8000', help='Url of the server to load')
+        parser.add_argument('--requests', type=int, default=1000, help='Number of requests in each scenario')
+        parser.add_argument('--warmup', type=int, default=50, help='Number of requests before measurement')
+        parser.add_argument('--concurrency', type=int, default=10, help='Number of concurrent clients')
+        parser.add_argument('--scenario', action='append', help='Scenario to run, all scenarios by default')
+        parser.add_argument('--username', default=None, help='Staff user for admin scenarios, the first one by default')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed of requested questions')
+        parser.add_argument('--output', default=None, help='File to save JSON results, stdout by default')
+
+    def handle(self, *args, **options):
+        self.base_url = options['base_url'].rstrip('/')
+        self.rnd = random.Random(options['seed'])
+        self.questions = list(Question.objects.order_by('pk').values_list('pk', flat=True)[:1000])
+        self.text_questions = list(
+            Question.objects.filter(type=Question.TEXT).order_by('pk').values_list('pk', flat=True)[:1000]
+        )
+        if not self.questions or not self.text_questions:
+            raise CommandError('There are no questions, seed database with seed_data command')
+        # Submitted answers belong to new users, so they don't conflict with existing ones
+        self.user_ids = itertools.count((Answer.objects.aggregate(user_id=Max('user_id'))['user_id'] or 0) + 1)
+        self.lock = threading.Lock()
+
+        users = get_user_model().objects.filter(is_staff=True).order_by('pk')
+        admin = users.filter(username=options['username']).first() if options['username'] else users.first()
+        self.admin_headers = {}
+        if admin is not None:
+            token = ClaimsTokenObtainPairSerializer.get_token(admin).access_token
+            self.admin_headers = {'Authorization': f'Bearer {token}'}
+
+        scenarios = {
+            'poll_list': self.poll_list,
+            'question_fetch': self.question_fetch,
+            'answer_submit': self.answer_submit,
+            'admin_answer_list': self.admin_answer_list,
+        }
+        names = options['scenario'] or list(scenarios)
+        unknown = set(names) - set(scenarios)
+        if unknown:
+            raise CommandError(f'Unknown scenarios: {", ".join(sorted(unknown))}')
+        if 'admin_answer_list' in names and not self.admin_headers:
+            self.stderr.write('There are no staff users, admin_answer_list scenario is skipped')
+            names.remove('admin_answer_list')
+
+        results = {
+            'started': timezone.now().isoformat(),
+            'base_url': self.base_url,
+            'requests': options['requests'],
+            'concurrency': options['concurrency'],
+            'seed': options['seed'],
+            'scenarios': {},
+        }
+        for name in names:
+            result = self.run(scenarios[name], options['requests'], options['warmup'], options['concurrency'])
+            result['queries'] = self.count_queries(scenarios[name])
+            results['scenarios'][name] = result
+            self.stdout.write(
+                f'{name}: {result["rps"]:.1f} requests/sec, p50 {result["p50_ms"]} ms, p95 {result["p95_ms"]} ms, '
+                f'p99 {result["p99_ms"]} ms, {result["queries"]} queries, {result["errors"]} errors',
+                style_func=self.style.SUCCESS if not result['errors'] else self.style.WARNING
+            )
+
+        data = json.dumps(results, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(data + '\n')
+        else:
+            self.stdout.write(data)
+
+    # Scenarios return method, path, JSON body and headers of the next request
+    def poll_list(self):
+        return 'GET', '/polls/', None, {}
+
+    def question_fetch(self):
+        with self.lock:
+            pk = self.rnd.choice(self.questions)
+        return 'GET', f'/questions/{pk}/', None, {}
+
+    def answer_submit(self):
+        with self.lock:
+            pk = self.rnd.choice(self.text_questions)
+        return 'POST', '/answers/', {'user_id': next(self.user_ids), 'question': pk, 'answer': 'Benchmark'}, {}
+
+    def admin_answer_list(self):
+        return 'GET', '/answers/?page_size=100', None, self.admin_headers
+
+    # Sends requests from concurrent clients with keep-alive sessions and measures latency
+    def run(self, scenario, count, warmup, concurrency):
+        local = threading.local()
+
+        def send(_):
+            if not hasattr(local, 'session'):
+                local.session = requests.Session()
+            method, path, body, headers = scenario()
+            started = time.perf_counter()
+            try:
+                response = local.session.request(method, self.base_url + path, json=body, headers=headers)
+                ok = response.status_code < 400
+            except requests.RequestException:
+                ok = False
+            return time.perf_counter() - started, ok
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(send, range(warmup)))
+            started = time.perf_counter()
+            measured = list(executor.map(send, range(count)))
+            elapsed = time.perf_counter() - started
+
+        latencies = sorted(latency * 1000 for latency, _ in measured)
+        return {
+            'requests': count,
+            'errors': sum(not ok for _, ok in measured),
+            'rps': round(count / elapsed, 1) if elapsed else None,
+            'mean_ms': round(statistics.mean(latencies), 2) if latencies else None,
+            'p50_ms': round(percentile(latencies, 50), 2) if latencies else None,
+            'p95_ms': round(percentile(latencies, 95), 2) if latencies else None,
+            'p99_ms': round(percentile(latencies, 99), 2) if latencies else None,
+        }
+
+    # Server queries are not visible over HTTP, so one request is repeated in process with the same database
+    def count_queries(self, scenario):
+        method, path, body, headers = scenario()
+        client = Client(HTTP_HOST=urlparse(self.base_url).netloc)
+        extra = {f'HTTP_{key.upper()}': value for key, value in headers.items()}
+        with CaptureQueriesContext(connection) as queries:
+            if method == 'GET':
+                client.get(path, **extra)
+            else:
+                client.post(path, data=json.dumps(body), content_type='application/json', **extra)
+        return len(queries)
@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework import status
+
+from polls import spool
+from polls.batching import save_answers
+
+
+class Command(BaseCommand):
+    help = 'Moves answers submitted to the spool (ANSWERS_INGEST_MODE=spool) to database in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Max number of answers saved at once')
+        parser.add_argument('--interval', type=float, default=0.5, help='Seconds to wait when spool is empty')
+        parser.add_argument('--keep', type=int, default=86400, help='Seconds to keep results of processed submissions')
+        parser.add_argument('--once', action='store_true', help='Drain pending answers and exit')
+
+    def handle(self, *args, **options):
+        answer_spool = spool.get_spool()
+        while True:
+            drained = self.drain(answer_spool, options['batch_size'])
+            if options['once']:
+                break
+            if not drained:
+                answer_spool.purge(options['keep'])
+                time.sleep(options['interval'])
+
+    def drain(self, answer_spool, batch_size):
+        """
+        Saves batches of pending answers until spool is empty, returns number of saved answers.
+        """
+        drained = 0
+        while True:
+            batch = answer_spool.take(batch_size)
+            if not batch:
+                return drained
+            results = save_answers([data for _, data in batch])
+            # Repeated submission of the same answer gets the stored answer with 200
+            answer_spool.complete([
+                (submission_id, spool.CREATED if status.is_success(status_code) else spool.REJECTED, result)
+                for (submission_id, _), (status_code, result) in zip(batch, results)
+            ])
+            drained += len(batch)
+            self.stdout.write(f'Saved {len(batch)} answers')
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from polls.models import Answer
+from polls.models import Poll
+
+
+class Command(BaseCommand):
+    help = 'Prints query plans and average latency of the hot query shapes of the API'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=100, help='Number of runs to average latency')
+
+    def handle(self, *args, **options):
+        answer = Answer.objects.order_by('-pk').first()
+        user_id, question = (answer.user_id, answer.question_id) if answer else (0, 0)
+        queries = {
+            'Active polls': Poll.objects.filter(is_active=True).order_by('id'),
+            'Answers of user': Answer.objects.filter(user_id=user_id).order_by('id')[:100],
+            'Answer of user for question': Answer.objects.filter(user_id=user_id, question=question),
+        }
+        for name, queryset in queries.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(queryset.explain())
+            started = time.perf_counter()
+            for _ in range(options['repeat']):
+                list(queryset.all())
+            latency = (time.perf_counter() - started) / options['repeat'] * 1000
+            self.stdout.write(f'Average latency: {latency:.3f} ms\n')
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from polls import tallies
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds question and option tallies (poll results) from answers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('polls', nargs='*', type=int, help='Pk of polls to rebuild, all polls by default')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            questions, opts = tallies.rebuild(options['polls'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt tallies for {questions} questions and {opts} options'))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from polls import tallies
+from polls.models import PollStats
+
+
+class Command(BaseCommand):
+    help = 'Compares poll statistics (respondents and completions) with answers and optionally fixes drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument('polls', nargs='*', type=int, help='Pk of polls to check, all polls by default')
+        parser.add_argument('--fix', action='store_true', help='Recompute statistics of polls with drift')
+
+    def handle(self, *args, **options):
+        _, expected = tallies.compute_stats(options['polls'])
+        stored = {
+            stats.poll_id: (stats.respondents, stats.completions)
+            for stats in PollStats.objects.filter(poll__in=expected)
+        }
+        drifted = []
+        for poll, values in sorted(expected.items()):
+            actual = stored.get(poll, (0, 0))
+            if actual != values:
+                drifted.append(poll)
+                self.stdout.write(
+                    f'Poll #{poll}: stored {actual[0]} respondents, {actual[1]} completions, '
+                    f'expected {values[0]} respondents, {values[1]} completions'
+                )
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS(f'Statistics of {len(expected)} polls are consistent'))
+            return
+        if options['fix']:
+            with transaction.atomic():
+                tallies.rebuild_stats(drifted)
+            self.stdout.write(self.style.SUCCESS(f'Fixed statistics of {len(drifted)} polls'))
+        else:
+            self.stdout.write(self.style.WARNING(f'Statistics of {len(drifted)} polls drifted, run with --fix'))
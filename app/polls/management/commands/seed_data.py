@@ -0,0 +1,116 @@
+import random
+from datetime import timedelta as td
+
+import factory.random
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from polls import tallies
+from polls.models import Answer
+from polls.models import Option
+from polls.models import Poll
+from polls.models import Question
+from polls.models import answer_digest
+from polls.tests.factories import AnswersFactory
+from polls.tests.factories import OptionsFactory
+from polls.tests.factories import PollsFactory
+from polls.tests.factories import QuestionsFactory
+
+QUESTION_TYPES = (Question.TEXT, Question.SINGLE_OPTION, Question.MULTIPLE_OPTIONS)
+
+
+class Command(BaseCommand):
+    help = 'Seeds database with active polls, questions, options and answers for benchmarks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--polls', type=int, default=10, help='Number of polls')
+        parser.add_argument('--questions', type=int, default=10, help='Number of questions in each poll')
+        parser.add_argument('--options', type=int, default=5, help='Number of options of option questions')
+        parser.add_argument('--users', type=int, default=1000, help='Number of users answering polls')
+        parser.add_argument('--polls-per-user', type=int, default=3, help='Number of polls answered by each user')
+        parser.add_argument('--first-user', type=int, default=1, help='Id of the first user')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Number of answers inserted at once')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed, the same seed gives the same data')
+
+    def handle(self, *args, **options):
+        rnd = random.Random(options['seed'])
+        factory.random.reseed_random(options['seed'])
+        today = timezone.localdate()
+
+        polls = Poll.objects.bulk_create([
+            PollsFactory.build(
+                start_date=today - td(days=rnd.randint(0, 30)), end_date=today + td(days=rnd.randint(1, 30)), is_active=True
+            )
+            for _ in range(options['polls'])
+        ])
+        if polls and polls[0].pk is None:
+            polls = list(Poll.objects.order_by('-pk')[:len(polls)])[::-1]
+        Question.objects.bulk_create([
+            QuestionsFactory.build(poll=poll, type=rnd.choice(QUESTION_TYPES))
+            for poll in polls for _ in range(options['questions'])
+        ])
+        questions = list(Question.objects.filter(poll__in=polls).order_by('pk'))
+        Option.objects.bulk_create([
+            OptionsFactory.build(question=question, number=number)
+            for question in questions if question.type != Question.TEXT
+            for number in range(1, options['options'] + 1)
+        ])
+        self.stdout.write(f'Created {len(polls)} polls and {len(questions)} questions')
+
+        by_poll = {}
+        for question in questions:
+            by_poll.setdefault(question.poll_id, []).append(question)
+        option_pks = {
+            (question, number): pk
+            for pk, question, number in Option.objects.filter(question__in=questions).values_list('pk', 'question', 'number')
+        }
+        answers = []
+        count = 0
+        for user_id in range(options['first_user'], options['first_user'] + options['users']):
+            for poll in rnd.sample(polls, min(options['polls_per_user'], len(polls))):
+                for question in by_poll.get(poll.pk, []):
+                    text = self.answer(rnd, question, options['options'])
+                    answers.append(AnswersFactory.build(
+                        user_id=user_id, question=question, answer=text, digest=answer_digest(text)
+                    ))
+                    if len(answers) >= options['batch_size']:
+                        count += self.insert(answers, option_pks)
+                        answers = []
+        count += self.insert(answers, option_pks)
+
+        pks = [poll.pk for poll in polls]
+        with transaction.atomic():
+            tallies.rebuild(pks)
+            tallies.rebuild_stats(pks)
+        self.stdout.write(self.style.SUCCESS(f'Created {count} answers of {options["users"]} users'))
+
+    # Returns answer text: random words or option numbers
+    def answer(self, rnd, question, options):
+        if question.type == Question.TEXT or not options:
+            return f'Answer {rnd.randint(1, 100)}'
+        if question.type == Question.SINGLE_OPTION:
+            return str(rnd.randint(1, options))
+        return ' '.join(str(number) for number in sorted(rnd.sample(range(1, options + 1), rnd.randint(1, options))))
+
+    # Inserts answers with selected options, pk are fetched if backend doesn't return them
+    def insert(self, answers, option_pks):
+        if not answers:
+            return 0
+        with transaction.atomic():
+            Answer.objects.bulk_create(answers)
+            if any(answer.pk is None for answer in answers):
+                pks = dict(
+                    ((user_id, question), pk) for pk, user_id, question in Answer.objects.filter(
+                        user_id__in={answer.user_id for answer in answers},
+                        question__in={answer.question_id for answer in answers}
+                    ).values_list('pk', 'user_id', 'question')
+                )
+                for answer in answers:
+                    answer.pk = pks[(answer.user_id, answer.question_id)]
+            Answer.options.through.objects.bulk_create([
+                Answer.options.through(answer_id=answer.pk, option_id=option_pks[(answer.question_id, number)])
+                for answer in answers
+                for number in tallies.parse_options(answer.question.type, answer.answer)
+            ])
+        return len(answers)
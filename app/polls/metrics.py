@@ -0,0 +1,160 @@
+"""
+Per-route request metrics collected by `MetricsMiddleware` and exposed in Prometheus text format.
+
+Metrics are kept in memory of the process, so every worker reports its own requests.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import HttpResponse
+
+from .middleware import HybridMiddleware
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERIES_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+
+METRICS = {
+    'http_request_duration_seconds': ('histogram', 'Request latency by route', LATENCY_BUCKETS),
+    'db_queries_per_request': ('histogram', 'Database queries per request by route', QUERIES_BUCKETS),
+    'db_duration_seconds': ('histogram', 'Time of database queries per request by route', LATENCY_BUCKETS),
+    'http_response_size_bytes': ('histogram', 'Response body size by route', SIZE_BUCKETS),
+    'http_requests_total': ('counter', 'Requests by route, method and status', None),
+}
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    """
+    Thread-safe storage of histograms and counters by metric name and labels.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values = {name: {} for name in METRICS}
+
+    def observe(self, name, labels, value):
+        with self.lock:
+            series = self.values[name]
+            if labels not in series:
+                series[labels] = Histogram(METRICS[name][2])
+            series[labels].observe(value)
+
+    def inc(self, name, labels, value=1):
+        with self.lock:
+            series = self.values[name]
+            series[labels] = series.get(labels, 0) + value
+
+    def clear(self):
+        with self.lock:
+            for series in self.values.values():
+                series.clear()
+
+    def render(self):
+        lines = []
+        with self.lock:
+            for name, (kind, description, _) in METRICS.items():
+                lines.append(f'# HELP {name} {description}')
+                lines.append(f'# TYPE {name} {kind}')
+                for labels, value in sorted(self.values[name].items()):
+                    if kind == 'counter':
+                        lines.append(f'{name}{{{_labels(labels)}}} {value}')
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(value.buckets + ('+Inf',), value.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{{{_labels(labels + (("le", bound),))}}} {cumulative}')
+                    lines.append(f'{name}_sum{{{_labels(labels)}}} {value.sum}')
+                    lines.append(f'{name}_count{{{_labels(labels)}}} {value.count}')
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(labels):
+    return ','.join(f'{key}="{value}"' for key, value in labels)
+
+
+registry = Registry()
+
+
+class QueryCounter:
+    """
+    Database execute wrapper counting queries and their total time.
+    """
+    def __init__(self):
+        self.count = 0
+        self.duration = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+
+
+class MetricsMiddleware(HybridMiddleware):
+    """
+    Records latency, database queries and response size of each request by resolved route name
+    and adds `Server-Timing` header with database and total time. Under ASGI requests are not
+    passed to a thread, queries of async views run in other threads and are not counted.
+    """
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed()
+        super().__init__(get_response)
+
+    def handle(self, request):
+        counter = QueryCounter()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+            response = self.get_response(request)
+        return self.record(request, response, time.perf_counter() - started, counter)
+
+    async def ahandle(self, request):
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        return self.record(request, response, time.perf_counter() - started)
+
+    def record(self, request, response, duration, counter=None):
+        match = getattr(request, 'resolver_match', None)
+        route = (('route', match.view_name if match else 'unmatched'),)
+        registry.observe('http_request_duration_seconds', route, duration)
+        if counter is not None:
+            registry.observe('db_queries_per_request', route, counter.count)
+            registry.observe('db_duration_seconds', route, counter.duration)
+        if not response.streaming:
+            registry.observe('http_response_size_bytes', route, len(response.content))
+        registry.inc('http_requests_total', route + (('method', request.method), ('status', response.status_code)))
+
+        timing = f'total;dur={duration * 1000:.1f}'
+        if counter is not None:
+            timing = f'db;dur={counter.duration * 1000:.1f};desc="{counter.count} queries", {timing}'
+        response['Server-Timing'] = timing
+        return response
+
+
+def metrics(request):
+    """
+    Returns collected metrics in Prometheus text format.
+    """
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,31 @@
+"""
+Base of middleware which serves requests in the mode of the handler (WSGI or ASGI).
+"""
+import asyncio
+
+
+class HybridMiddleware:
+    """
+    Middleware which handles requests by `handle` under WSGI and by coroutine `ahandle` under ASGI
+    (when `get_response` is a coroutine function), so async requests are not passed to a thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            # Marks instance as coroutine function for Django handler, as MiddlewareMixin does
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.ahandle(request)
+        return self.handle(request)
+
+    def handle(self, request):
+        return self.get_response(request)
+
+    async def ahandle(self, request):
+        return await self.get_response(request)
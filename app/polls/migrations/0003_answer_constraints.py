@@ -0,0 +1,67 @@
+# Generated by Django 3.1.7 on 2026-10-18 15:22
+
+import sys
+from collections import Counter
+
+from django.db import migrations, models
+from django.db.models import Count
+
+BATCH_SIZE = 2000
+
+
+def remove_duplicate_answers(apps, schema_editor):
+    # Keep only the latest answer of user for each question in one DELETE, tallies are rebuilt without
+    # the removed answers
+    Answer = apps.get_model('polls', 'Answer')
+    table = schema_editor.quote_name(Answer._meta.db_table)
+    pk = schema_editor.quote_name(Answer._meta.pk.column)
+    user = schema_editor.quote_name(Answer._meta.get_field('user_id').column)
+    question = schema_editor.quote_name(Answer._meta.get_field('question').column)
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} WHERE {pk} IN (SELECT {pk} FROM ('
+            f'SELECT {pk}, ROW_NUMBER() OVER (PARTITION BY {user}, {question} ORDER BY {pk} DESC) AS position '
+            f'FROM {table}) AS ranked WHERE position > 1)'
+        )
+        removed = cursor.rowcount
+    if removed > 0:
+        questions = rebuild_tallies(apps)
+        sys.stdout.write(f'\n  Removed {removed} duplicate answers, tallies rebuilt for {questions} questions\n')
+
+
+def rebuild_tallies(apps):
+    Answer = apps.get_model('polls', 'Answer')
+    QuestionTally = apps.get_model('polls', 'QuestionTally')
+    OptionTally = apps.get_model('polls', 'OptionTally')
+    QuestionTally.objects.all().delete()
+    OptionTally.objects.all().delete()
+
+    responses = Answer.objects.order_by().values_list('question').annotate(n=Count('id'))
+    QuestionTally.objects.bulk_create(
+        [QuestionTally(question_id=question, responses=n) for question, n in responses], batch_size=BATCH_SIZE
+    )
+    options = Counter()
+    answers = Answer.objects.filter(question__type__in=['SO', 'MO']).order_by().values_list('question', 'answer')
+    for question, answer in answers.iterator(chunk_size=BATCH_SIZE):
+        for number in {int(number) for number in answer.split() if number.isdigit()}:
+            options[(question, number)] += 1
+    OptionTally.objects.bulk_create(
+        [OptionTally(question_id=question, option=number, count=n) for (question, number), n in options.items()],
+        batch_size=BATCH_SIZE
+    )
+    return len(responses)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0002_tallies'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_answers, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='answer',
+            constraint=models.UniqueConstraint(fields=('user_id', 'question'), name='unique_user_answer'),
+        ),
+    ]
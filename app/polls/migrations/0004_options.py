@@ -0,0 +1,70 @@
+# Generated by Django 3.1.7 on 2026-10-18 15:28
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+BATCH_SIZE = 2000
+
+
+def numbers(answer):
+    return {int(number) for number in answer.split() if number.isdigit()}
+
+
+def link_answer_options(apps, schema_editor):
+    # Create options of every existing option question: single digits accepted by the former validation
+    # and numbers referenced by existing answers, then link answers to them
+    Answer = apps.get_model('polls', 'Answer')
+    Option = apps.get_model('polls', 'Option')
+    Question = apps.get_model('polls', 'Question')
+    AnswerOption = Answer.options.through
+    answers = Answer.objects.filter(question__type__in=['SO', 'MO']).order_by()
+
+    created = {
+        (question, number)
+        for question in Question.objects.filter(type__in=['SO', 'MO']).values_list('pk', flat=True).iterator()
+        for number in range(10)
+    }
+    selected = answers.values_list('question_id', 'answer').distinct()
+    created.update((question, number) for question, answer in selected for number in numbers(answer))
+    Option.objects.bulk_create(
+        [Option(question_id=question, number=number) for question, number in created],
+        batch_size=BATCH_SIZE
+    )
+    options = {(question, number): pk for pk, question, number in Option.objects.values_list('pk', 'question_id', 'number')}
+
+    links = []
+    for pk, question, answer in answers.values_list('pk', 'question_id', 'answer').iterator(chunk_size=BATCH_SIZE):
+        links.extend(AnswerOption(answer_id=pk, option_id=options[(question, number)]) for number in numbers(answer))
+        if len(links) >= BATCH_SIZE:
+            AnswerOption.objects.bulk_create(links)
+            links = []
+    AnswerOption.objects.bulk_create(links)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0003_answer_constraints'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Option',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveSmallIntegerField()),
+                ('text', models.TextField(blank=True)),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='options', to='polls.question')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='answer',
+            name='options',
+            field=models.ManyToManyField(blank=True, related_name='answers', to='polls.Option'),
+        ),
+        migrations.AddConstraint(
+            model_name='option',
+            constraint=models.UniqueConstraint(fields=('question', 'number'), name='unique_option_number'),
+        ),
+        migrations.RunPython(link_answer_options, migrations.RunPython.noop),
+    ]
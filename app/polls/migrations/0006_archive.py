@@ -0,0 +1,37 @@
+# Generated by Django 3.1.7 on 2026-10-18 15:42
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0005_poll_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PollArchive',
+            fields=[
+                ('poll', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='archive', serialize=False, to='polls.poll')),
+                ('archived_at', models.DateTimeField(auto_now=True)),
+                ('answers', models.PositiveIntegerField(default=0)),
+                ('results', models.JSONField(default=list)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedAnswer',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('user_id', models.BigIntegerField()),
+                ('answer', models.TextField()),
+                ('poll', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='archived_answers', to='polls.poll')),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_answers', to='polls.question')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='archivedanswer',
+            index=models.Index(fields=['poll', 'id'], name='archived_answer_poll_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.1.7 on 2026-10-18 15:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0006_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='poll',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
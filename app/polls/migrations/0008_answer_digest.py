@@ -0,0 +1,51 @@
+# Generated by Django 3.1.7 on 2026-10-18 15:48
+
+import hashlib
+
+from django.db import migrations, models
+
+BATCH_SIZE = 2000
+
+
+def digest(text):
+    return hashlib.md5(' '.join(text.casefold().split()).encode()).hexdigest()
+
+
+def fill_digests(apps, schema_editor):
+    # Digest of normalized text of existing answers, index is created after
+    for name in ('Answer', 'ArchivedAnswer'):
+        model = apps.get_model('polls', name)
+        last = 0
+        while True:
+            rows = list(model.objects.filter(pk__gt=last).order_by('pk').only('pk', 'answer')[:BATCH_SIZE])
+            if not rows:
+                break
+            for row in rows:
+                row.digest = digest(row.answer)
+            model.objects.bulk_update(rows, ['digest'])
+            last = rows[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0007_poll_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='answer',
+            name='digest',
+            field=models.CharField(default='', editable=False, max_length=32),
+        ),
+        migrations.AddField(
+            model_name='archivedanswer',
+            name='digest',
+            field=models.CharField(default='', editable=False, max_length=32),
+        ),
+        migrations.RunPython(fill_digests, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='answer',
+            index=models.Index(fields=['question', 'digest'], name='answer_digest_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 3.1.7 on 2026-10-18 15:59
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def fill_is_active(apps, schema_editor):
+    today = timezone.localdate()
+    Poll = apps.get_model('polls', 'Poll')
+    Poll.objects.filter(start_date__lte=today, end_date__gte=today).update(is_active=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0008_answer_digest'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='poll',
+            name='is_active',
+            field=models.BooleanField(db_index=True, default=False, editable=False),
+        ),
+        migrations.RunPython(fill_is_active, migrations.RunPython.noop),
+    ]
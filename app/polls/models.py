@@ -1,4 +1,18 @@
+import hashlib
+
 from django.db import models
+from django.utils import timezone
+
+
+def normalize_answer(text):
+    """
+    Returns answer text in case-insensitive form with collapsed whitespace, used to group text answers.
+    """
+    return ' '.join(text.casefold().split())
+
+
+def answer_digest(text):
+    return hashlib.md5(normalize_answer(text).encode()).hexdigest()
 
 
 class Poll(models.Model):
@@ -6,6 +20,29 @@ class Poll(models.Model):
     start_date = models.DateField()
     end_date = models.DateField()
     description = models.TextField(blank=True)
+    # Bumped on every write of the poll, its questions and options, used as HTTP validator
+    version = models.PositiveIntegerField(default=1, editable=False)
+    # Poll is open today (in TIME_ZONE), flipped at date boundaries by activate_polls command
+    is_active = models.BooleanField(default=False, db_index=True, editable=False)
+
+    def is_active_on(self, date):
+        start_date = self._meta.get_field('start_date').to_python(self.start_date)
+        end_date = self._meta.get_field('end_date').to_python(self.end_date)
+        return start_date <= date <= end_date
+
+    # Version of existing poll is bumped in database by post_save signal, so in-memory value
+    # (possibly stale) is not written back and is refreshed after save
+    def save(self, *args, **kwargs):
+        self.is_active = self.is_active_on(timezone.localdate())
+        if self._state.adding or kwargs.get('force_insert'):
+            super().save(*args, **kwargs)
+            return
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            update_fields = [field.name for field in self._meta.concrete_fields if not field.primary_key]
+        kwargs['update_fields'] = [name for name in update_fields if name != 'version']
+        super().save(*args, **kwargs)
+        self.refresh_from_db(fields=['version'])
 
     def __str__(self):
         return f'Poll #{self.pk} {self.title} start: {self.start_date} ' \
@@ -31,11 +68,136 @@ class Question(models.Model):
         return f'Question #{self.pk} for poll: "{self.poll}" text: "{self.text}", type: {self.type}'
 
 
+class Option(models.Model):
+    """
+    Option of `Single option` or `Multiple options` question, answers refer it by `number`.
+    """
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='options')
+    number = models.PositiveSmallIntegerField()
+    text = models.TextField(blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['question', 'number'], name='unique_option_number'),
+        ]
+
+    def __str__(self):
+        return f'Option #{self.number} of question #{self.question_id}: "{self.text}"'
+
+
 class Answer(models.Model):
 
     user_id = models.BigIntegerField()
     question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='answers')
     answer = models.TextField()
+    # Hash of normalized answer text, set on save (and explicitly for bulk insert)
+    digest = models.CharField(max_length=32, default='', editable=False)
+    # Selected options of `Single option` or `Multiple options` question, `answer` keeps their numbers
+    options = models.ManyToManyField(Option, blank=True, related_name='answers')
+
+    class Meta:
+        # Also serves as index for lookup of user answers
+        constraints = [
+            models.UniqueConstraint(fields=['user_id', 'question'], name='unique_user_answer'),
+        ]
+        indexes = [
+            models.Index(fields=['question', 'digest'], name='answer_digest_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.digest = answer_digest(self.answer)
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f'Answer #{self.pk} for question "{self.question}" by user "{self.user_id}": {self.answer}'
+
+
+class QuestionTally(models.Model):
+    """
+    Precomputed count of answers for question, updated on every answer write.
+    """
+    question = models.OneToOneField(Question, on_delete=models.CASCADE, primary_key=True, related_name='tally')
+    responses = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f'Tally for question #{self.question_id}: {self.responses} responses'
+
+
+class OptionTally(models.Model):
+    """
+    Precomputed count of answers selected option of `Single option` or `Multiple options` question.
+    """
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='option_tallies')
+    option = models.PositiveSmallIntegerField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['question', 'option'], name='unique_option_tally'),
+        ]
+
+    def __str__(self):
+        return f'Tally for option {self.option} of question #{self.question_id}: {self.count}'
+
+
+class PollStats(models.Model):
+    """
+    Precomputed count of users answered the poll and users answered all its questions.
+    """
+    poll = models.OneToOneField(Poll, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    respondents = models.PositiveIntegerField(default=0)
+    completions = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f'Stats of poll #{self.poll_id}: {self.respondents} respondents, {self.completions} completions'
+
+
+class Participation(models.Model):
+    """
+    Number of questions of the poll answered by user, used to maintain `PollStats`.
+    """
+    poll = models.ForeignKey(Poll, on_delete=models.CASCADE, related_name='participations')
+    user_id = models.BigIntegerField()
+    answered = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['poll', 'user_id'], name='unique_participation'),
+        ]
+
+    def __str__(self):
+        return f'User "{self.user_id}" answered {self.answered} questions of poll #{self.poll_id}'
+
+
+class PollArchive(models.Model):
+    """
+    Results of closed poll frozen when its answers were moved to `ArchivedAnswer` table.
+    """
+    poll = models.OneToOneField(Poll, on_delete=models.CASCADE, primary_key=True, related_name='archive')
+    archived_at = models.DateTimeField(auto_now=True)
+    answers = models.PositiveIntegerField(default=0)
+    # Questions with count of responses and selected options, the same as poll results
+    results = models.JSONField(default=list)
+
+    def __str__(self):
+        return f'Archive of poll #{self.poll_id}: {self.answers} answers'
+
+
+class ArchivedAnswer(models.Model):
+    """
+    Answer of archived poll keeping pk of the original answer, selected options are kept only in `answer`.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    poll = models.ForeignKey(Poll, on_delete=models.CASCADE, related_name='archived_answers', db_index=False)
+    user_id = models.BigIntegerField()
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='archived_answers')
+    answer = models.TextField()
+    digest = models.CharField(max_length=32, default='', editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['poll', 'id'], name='archived_answer_poll_idx'),
+        ]
+
+    def __str__(self):
+        return f'Archived answer #{self.pk} for question #{self.question_id} by user "{self.user_id}": {self.answer}'
@@ -0,0 +1,12 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class IdCursorPagination(CursorPagination):
+    """
+    Keyset pagination by `id`, so the cost of a deep page is the same as the first one.
+    Page size is taken from `page_size` query parameter limited by `API_MAX_PAGE_SIZE`.
+    """
+    ordering = 'id'
+    page_size_query_param = 'page_size'
+    max_page_size = settings.API_MAX_PAGE_SIZE
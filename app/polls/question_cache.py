@@ -0,0 +1,94 @@
+"""
+Per-process LRU cache of question metadata used by answer validation.
+
+Question and its options almost never change once poll starts, so answer validation
+reads them from the cache instead of database. Entries are invalidated by `Question`
+and `Option` signals in this process and expire after `QUESTION_CACHE_TTL` seconds,
+which bounds staleness in other processes.
+"""
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Count
+
+from .lru import LRUCache
+from .models import Option
+from .models import Question
+
+
+class QuestionInfo(namedtuple('QuestionInfo', ['pk', 'poll_id', 'type', 'options', 'archived', 'poll_size'])):
+    """
+    Question metadata, `options` is a dict of option pk by option number,
+    `archived` is True if answers of the poll are archived, `poll_size` is number of questions of the poll.
+    """
+
+    def question(self):
+        """
+        Returns unsaved `Question` instance which can be assigned to answer without a query.
+        """
+        return Question(pk=self.pk, poll_id=self.poll_id, type=self.type)
+
+
+class QuestionCache:
+
+    def __init__(self):
+        self._entries = LRUCache(settings.QUESTION_CACHE_SIZE)
+
+    def get(self, pk):
+        """
+        Returns `QuestionInfo` of question or None if it doesn't exist.
+        """
+        return self.get_many([pk]).get(pk)
+
+    def get_many(self, pks):
+        """
+        Returns dict of `QuestionInfo` by pk for existing questions of `pks`, missing entries
+        are loaded by one query for questions and one for their options.
+        """
+        found = {}
+        missing = []
+        for pk in pks:
+            info = self._entries.get(pk)
+            if info is not None:
+                found[pk] = info
+            else:
+                missing.append(pk)
+        if missing:
+            loaded = self._load(missing)
+            expires = time.time() + settings.QUESTION_CACHE_TTL
+            for pk, info in loaded.items():
+                self._entries.set(pk, info, expires)
+            found.update(loaded)
+        return found
+
+    def invalidate(self, pk):
+        self._entries.delete(pk)
+
+    def invalidate_many(self, pks):
+        for pk in pks:
+            self._entries.delete(pk)
+
+    def clear(self):
+        self._entries.clear()
+
+    # Entries are loaded from the primary, so they are not stale because of replication lag
+    @staticmethod
+    def _load(pks):
+        options = {}
+        queryset = Option.objects.using(DEFAULT_DB_ALIAS).filter(question__in=pks)
+        for pk, question, number in queryset.values_list('pk', 'question', 'number'):
+            options.setdefault(question, {})[number] = pk
+        questions = Question.objects.using(DEFAULT_DB_ALIAS).filter(pk__in=pks).annotate(
+            poll_size=Count('poll__questions')
+        )
+        return {
+            pk: QuestionInfo(pk, poll_id, type, options.get(pk, {}), archive is not None, poll_size)
+            for pk, poll_id, type, archive, poll_size in questions.values_list(
+                'pk', 'poll', 'type', 'poll__archive', 'poll_size'
+            )
+        }
+
+
+question_cache = QuestionCache()
@@ -0,0 +1,83 @@
+import csv
+import json
+
+from rest_framework.renderers import BaseRenderer
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class _Echo:
+    """
+    File-like object which returns written value instead of storing it (for `csv.writer`).
+    """
+    def write(self, value):
+        return value
+
+
+class CSVRenderer(BaseRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def stream(self, columns, rows):
+        """
+        Yields CSV lines: header with `columns` then each of `rows` (tuples of values).
+        """
+        writer = csv.writer(_Echo())
+        yield writer.writerow(columns)
+        for row in rows:
+            yield writer.writerow(row)
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        items = data if isinstance(data, list) else [data]
+        columns = list(items[0].keys()) if items else []
+        return ''.join(self.stream(columns, ([item.get(column) for column in columns] for item in items))).encode()
+
+
+class NDJSONRenderer(BaseRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def stream(self, columns, rows):
+        """
+        Yields JSON objects (one per line) built from `rows` (tuples of values) by `columns`.
+        """
+        for row in rows:
+            yield json.dumps(dict(zip(columns, row)), ensure_ascii=False) + '\n'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        items = data if isinstance(data, list) else [data]
+        return ''.join(json.dumps(item, ensure_ascii=False) + '\n' for item in items).encode()
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    `JSONRenderer` using orjson when it's installed. Output is compact UTF-8 with escaped U+2028
+    and U+2029 as of `JSONRenderer`, dates and other types are encoded by `encoder_class`, but floats
+    are written in shortest form (`1e16`, `1e-7`, `0.000025`, not `1e+16`, `1e-07`, `2.5e-05`) and
+    NaN and infinity as `null` instead of error. Checking data for floats costs as much as rendering
+    it by `JSONRenderer`, so they are not rendered by it. Indented output and data orjson can't encode
+    are rendered by `JSONRenderer`.
+    """
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (orjson is None or data is None or self.ensure_ascii or not self.compact
+                or self.get_indent(accepted_media_type, renderer_context or {})):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(
+                data,
+                default=self.encoder_class().default,
+                option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+            )
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
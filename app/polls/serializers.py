@@ -1,10 +1,22 @@
 import re
 
+from django.db import IntegrityError
+from django.db import transaction
 from rest_framework import serializers
+from rest_framework.settings import api_settings
+from rest_framework.validators import UniqueTogetherValidator
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
+from . import tallies
 from .models import Answer
+from .models import Option
 from .models import Poll
 from .models import Question
+from .models import answer_digest
+from .question_cache import question_cache
+
+ALREADY_ANSWERED = 'User has already answered this question'
+POLL_ARCHIVED = 'Poll is closed and its answers are archived'
 
 
 class QuestionSerializer(serializers.ModelSerializer):
@@ -13,8 +25,33 @@ class QuestionSerializer(serializers.ModelSerializer):
         fields = ['id', 'poll', 'text', 'type']
 
 
+class OptionSerializer(serializers.ModelSerializer):
+    number = serializers.IntegerField(min_value=1, max_value=32767)
+
+    class Meta:
+        model = Option
+        fields = ['id', 'question', 'number', 'text']
+        validators = [
+            UniqueTogetherValidator(queryset=Option.objects.all(), fields=['question', 'number']),
+        ]
+
+
+def get_expand(request):
+    """
+    Returns set of related objects requested to be embedded by `?expand=a,b` query parameter.
+    """
+    if request is None:
+        return set()
+    return {name.strip() for name in request.query_params.get('expand', '').split(',') if name.strip()}
+
+
 class PollSerializer(serializers.ModelSerializer):
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if 'questions' in get_expand(self.context.get('request')):
+            self.fields['questions'] = QuestionSerializer(many=True, read_only=True)
+
     # Validate that start date lower then end date
     def validate(self, attrs):
         if attrs['start_date'] >= attrs['end_date']:
@@ -26,17 +63,175 @@ class PollSerializer(serializers.ModelSerializer):
         fields = ['id', 'title', 'start_date', 'end_date', 'description']
 
 
+class QuestionField(serializers.PrimaryKeyRelatedField):
+    """
+    Resolves question from `question_cache`, so answer validation doesn't query
+    the database when the cache is warm.
+    """
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            info = question_cache.get(int(data))
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if info is None:
+            self.fail('does_not_exist', pk_value=data)
+        return info.question()
+
+
+# Validated answer selects all option numbers of its text, so created answers are tallied without
+# reading their options back
+def selected_numbers(answers):
+    return {answer.pk: tallies.parse_options(answer.question.type, answer.answer) for answer in answers}
+
+
+class AnswerListSerializer(serializers.ListSerializer):
+
+    # Load all referenced questions missing in cache by one query before validate items
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            pks = set()
+            for item in data:
+                try:
+                    pks.add(int(item.get('question')))
+                except (AttributeError, TypeError, ValueError):
+                    continue
+            question_cache.get_many(pks)
+        validated_data = super().to_internal_value(data)
+        self._check_duplicates(validated_data, set())
+        return validated_data
+
+    def create(self, validated_data):
+        options = [attrs.pop('options', []) for attrs in validated_data]
+        answers = [Answer(**attrs, digest=answer_digest(attrs['answer'])) for attrs in validated_data]
+        try:
+            with transaction.atomic():
+                Answer.objects.bulk_create(answers)
+                if answers and answers[0].pk is None:
+                    # Backend doesn't return pk from bulk insert, fetch them by unique (user_id, question)
+                    existing = self._existing(answers)
+                    for answer in answers:
+                        answer.pk = existing[(answer.user_id, answer.question_id)]
+                Answer.options.through.objects.bulk_create([
+                    Answer.options.through(answer_id=answer.pk, option_id=option)
+                    for answer, selected in zip(answers, options) for option in selected
+                ])
+                tallies.add_answers(answers, selected_numbers(answers))
+        except IntegrityError:
+            self._check_duplicates(validated_data, self._existing(answers))
+            raise
+        return answers
+
+    @staticmethod
+    def _existing(answers):
+        queryset = Answer.objects.filter(
+            user_id__in={answer.user_id for answer in answers},
+            question__in={answer.question_id for answer in answers}
+        )
+        return {(user_id, question): pk for pk, user_id, question in queryset.values_list('pk', 'user_id', 'question')}
+
+    @staticmethod
+    def _check_duplicates(validated_data, existing):
+        # Report every item which repeats an answer of the batch or an already stored answer
+        seen = set(existing)
+        errors = []
+        for attrs in validated_data:
+            key = (attrs['user_id'], attrs['question'].pk)
+            errors.append({api_settings.NON_FIELD_ERRORS_KEY: [ALREADY_ANSWERED]} if key in seen else {})
+            seen.add(key)
+        if any(errors):
+            raise serializers.ValidationError(errors)
+
+
 class AnswerSerializer(serializers.ModelSerializer):
+    question = QuestionField(queryset=Question.objects.all())
+    # True if `create` found the same answer already stored
+    replayed = False
+
     class Meta:
         model = Answer
         fields = ['id', 'user_id', 'question', 'answer']
+        list_serializer_class = AnswerListSerializer
 
     def validate(self, attrs):
-        question_type = attrs['question'].type
+        question = attrs['question']
         answer = attrs['answer']
-        if question_type == Question.SINGLE_OPTION and not re.fullmatch(r'^\d$', answer):
-            raise serializers.ValidationError(f'Answer for question with type `Single option` has to be a single digit')
-        elif question_type == Question.MULTIPLE_OPTIONS and not re.fullmatch(r'^(\d{1}\s+)*\d{1}\s*$', answer):
+        if question.type == Question.SINGLE_OPTION and not re.fullmatch(r'^\d+\s*$', answer):
+            raise serializers.ValidationError(f'Answer for question with type `Single option` has to be an option number')
+        elif question.type == Question.MULTIPLE_OPTIONS and not re.fullmatch(r'^(\d+\s+)*\d+\s*$', answer):
             raise serializers.ValidationError(f'Answer for question with type `Multiple '
-                                              f'option` be a digits separated by whitespace')
+                                              f'option` be option numbers separated by whitespace')
+        info = question_cache.get(question.pk)
+        if info.archived:
+            raise serializers.ValidationError(POLL_ARCHIVED)
+        attrs['options'] = []
+        if question.type != Question.TEXT:
+            numbers = tallies.parse_options(question.type, answer)
+            missing = [str(number) for number in numbers if number not in info.options]
+            if missing:
+                raise serializers.ValidationError(f'Question has no options: {", ".join(missing)}')
+            attrs['options'] = [info.options[number] for number in numbers]
         return attrs
+
+    # Duplicate answers are rejected by `unique_user_answer` constraint, except repeated
+    # submission of the same answer which returns the stored one
+    def create(self, validated_data):
+        options = validated_data.pop('options', [])
+        try:
+            with transaction.atomic():
+                answer = super().create(validated_data)
+                Answer.options.through.objects.bulk_create([
+                    Answer.options.through(answer_id=answer.pk, option_id=option) for option in options
+                ])
+                tallies.add_answers([answer], selected_numbers([answer]))
+        except IntegrityError:
+            existing = Answer.objects.filter(
+                user_id=validated_data['user_id'], question=validated_data['question']
+            ).first()
+            if existing is None or existing.answer != validated_data['answer']:
+                raise serializers.ValidationError(ALREADY_ANSWERED)
+            self.replayed = True
+            return existing
+        return answer
+
+    def update(self, instance, validated_data):
+        try:
+            with transaction.atomic():
+                old = tallies.count([instance])
+                digest = instance.digest
+                answer = super().update(instance, validated_data)
+                tallies.update_answer(old, answer, digest)
+        except IntegrityError:
+            raise serializers.ValidationError(ALREADY_ANSWERED)
+        return answer
+
+
+class QuestionResultsSerializer(serializers.ModelSerializer):
+    """
+    Question with precomputed count of responses and count of each selected option.
+    """
+    responses = serializers.SerializerMethodField()
+    options = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Question
+        fields = ['id', 'text', 'type', 'responses', 'options']
+
+    def get_responses(self, obj):
+        tally = getattr(obj, 'tally', None)
+        return tally.responses if tally is not None else 0
+
+    def get_options(self, obj):
+        return {str(tally.option): tally.count for tally in obj.option_tallies.all()}
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """
+    Adds `is_staff` claim to tokens, so stateless authentication can check permissions.
+    """
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token['is_staff'] = user.is_staff
+        return token
@@ -0,0 +1,68 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signals import request_started
+from django.db import connections
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from . import caching
+from .authentication import user_cache_key
+from .models import Option
+from .models import Poll
+from .models import PollStats
+from .models import Question
+from .models import QuestionTally
+from .question_cache import question_cache
+
+
+@receiver([post_save, post_delete], sender=Poll)
+def invalidate_active_polls(sender, instance, created=False, **kwargs):
+    caching.invalidate(caching.ACTIVE_POLLS)
+    if kwargs['signal'] is post_save and not created:
+        caching.bump_poll_version(instance.pk)
+
+
+# Statistics row exists from the start, so answer writes only update it
+@receiver(post_save, sender=Poll)
+def create_poll_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        PollStats.objects.bulk_create([PollStats(poll=instance)], ignore_conflicts=True)
+
+
+@receiver([post_save, post_delete], sender=Question)
+def invalidate_question(sender, instance, **kwargs):
+    # Entries of other questions of the poll keep number of its questions
+    question_cache.invalidate(instance.pk)
+    question_cache.invalidate_many(Question.objects.filter(poll=instance.poll_id).values_list('pk', flat=True))
+    caching.bump_poll_version(instance.poll_id)
+
+
+@receiver([post_save, post_delete], sender=Option)
+def invalidate_question_options(sender, instance, **kwargs):
+    question_cache.invalidate(instance.question_id)
+    poll = Question.objects.filter(pk=instance.question_id).values_list('poll', flat=True).first()
+    if poll is not None:
+        caching.bump_poll_version(poll)
+
+
+# Tally row exists from the start, so answer writes only update it
+@receiver(post_save, sender=Question)
+def create_question_tally(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        QuestionTally.objects.bulk_create([QuestionTally(question_id=instance.pk)], ignore_conflicts=True)
+
+
+@receiver([post_save, post_delete], sender=settings.AUTH_USER_MODEL)
+def invalidate_user(sender, instance, **kwargs):
+    cache.delete(user_cache_key(instance.pk))
+
+
+@receiver(request_started)
+def check_connections(sender, **kwargs):
+    # Close broken persistent connections, so the request opens a new one instead of failing
+    if not settings.SQL_CONN_HEALTH_CHECKS:
+        return
+    for connection in connections.all():
+        if connection.connection is not None and not connection.is_usable():
+            connection.close()
@@ -0,0 +1,106 @@
+"""
+Durable local queue (spool) of submitted answers for write-behind ingestion.
+
+Answers are appended to SQLite database in WAL mode, so submission costs a local append
+instead of a transaction in the main database. `drain_answers` management command
+moves them to `Answer` table in batches and stores result of each submission.
+"""
+import json
+import sqlite3
+import threading
+import time
+import uuid
+
+from django.conf import settings
+
+PENDING = 'pending'
+CREATED = 'created'
+REJECTED = 'rejected'
+
+_spools = {}
+_lock = threading.Lock()
+
+
+def get_spool():
+    """
+    Returns spool of `ANSWERS_SPOOL_PATH` shared by the process.
+    """
+    path = settings.ANSWERS_SPOOL_PATH
+    with _lock:
+        if path not in _spools:
+            _spools[path] = AnswerSpool(path)
+        return _spools[path]
+
+
+class AnswerSpool:
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._connection().execute(
+            'CREATE TABLE IF NOT EXISTS submission ('
+            'id TEXT PRIMARY KEY, data TEXT NOT NULL, status TEXT NOT NULL, result TEXT, updated REAL NOT NULL)'
+        )
+        self._connection().execute('CREATE INDEX IF NOT EXISTS submission_status ON submission (status, updated)')
+
+    # sqlite3 connection can't be shared between threads
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+        return connection
+
+    def put(self, data):
+        """
+        Appends answer data (dict) and returns id of the submission.
+        """
+        submission_id = uuid.uuid4().hex
+        self._connection().execute(
+            'INSERT INTO submission (id, data, status, updated) VALUES (?, ?, ?, ?)',
+            (submission_id, json.dumps(data), PENDING, time.time())
+        )
+        return submission_id
+
+    def get(self, submission_id):
+        """
+        Returns (status, result) of submission or None if it doesn't exist.
+        """
+        row = self._connection().execute(
+            'SELECT status, result FROM submission WHERE id = ?', (submission_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return row[0], json.loads(row[1]) if row[1] is not None else None
+
+    def take(self, limit):
+        """
+        Returns list of (id, data) of the oldest pending submissions.
+        """
+        rows = self._connection().execute(
+            'SELECT id, data FROM submission WHERE status = ? ORDER BY rowid LIMIT ?', (PENDING, limit)
+        ).fetchall()
+        return [(submission_id, json.loads(data)) for submission_id, data in rows]
+
+    def complete(self, results):
+        """
+        Stores results: list of (id, status, result).
+        """
+        now = time.time()
+        connection = self._connection()
+        with connection:
+            connection.execute('BEGIN')
+            connection.executemany(
+                'UPDATE submission SET status = ?, result = ?, updated = ? WHERE id = ?',
+                [(status, json.dumps(result), now, submission_id) for submission_id, status, result in results]
+            )
+
+    def purge(self, older_than):
+        """
+        Removes processed submissions completed more than `older_than` seconds ago.
+        """
+        self._connection().execute(
+            'DELETE FROM submission WHERE status != ? AND updated < ?', (PENDING, time.time() - older_than)
+        )
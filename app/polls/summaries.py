@@ -0,0 +1,67 @@
+"""
+Summary of answers of `Text answer` question: count of answers, count of distinct answers and
+the most frequent of them. Answers are grouped by digest of normalized text using
+`(question, digest)` index.
+
+Summaries are cached by count of answers in `QuestionTally`, so answers added or deleted by any
+worker are seen at once. Version of the summary is bumped only when answers of the question change
+without growth of the count (deleted answers, changed text or question), other processes with local
+memory cache see such changes in `SUMMARY_TIMEOUT` seconds. Versions expire with the summaries.
+"""
+from django.core.cache import cache
+from django.db.models import Count
+from django.db.models import Min
+
+from . import caching
+from . import db_routers
+from .models import Answer
+from .models import ArchivedAnswer
+from .models import QuestionTally
+from .models import normalize_answer
+
+SUMMARY = 'question_summary'
+SUMMARY_TIMEOUT = 5 * 60
+
+
+def _name(pk):
+    return f'{SUMMARY}:{pk}'
+
+
+def invalidate(pks):
+    if pks:
+        caching.invalidate(*(_name(pk) for pk in pks), timeout=SUMMARY_TIMEOUT)
+
+
+def compute(question, top, archived=False):
+    """
+    Returns summary of answers of the question (pk) with `top` most frequent answers, answers
+    are read from archive if `archived`.
+    """
+    answers = (ArchivedAnswer if archived else Answer).objects.filter(question=question).order_by()
+    totals = answers.aggregate(answers=Count('id'), distinct=Count('digest', distinct=True))
+    # Groups are counted by the index, text is read only for answers of the top groups
+    groups = list(answers.values('digest').annotate(count=Count('id')).order_by('-count', 'digest')[:top])
+    texts = dict(
+        answers.filter(digest__in=[group['digest'] for group in groups]).values('digest').annotate(
+            text=Min('answer')
+        ).values_list('digest', 'text')
+    )
+    return {
+        'answers': totals['answers'],
+        'distinct': totals['distinct'],
+        'top': [{'answer': normalize_answer(texts[group['digest']]), 'count': group['count']} for group in groups],
+    }
+
+
+def get_summary(question, top, archived=False):
+    """
+    Returns summary of answers of the question (pk) from cache or computes it.
+    """
+    with db_routers.primary():
+        responses = QuestionTally.objects.filter(question=question).values_list('responses', flat=True).first()
+        key = f'{_name(question)}:{responses}:{caching.get_version(_name(question), SUMMARY_TIMEOUT)}:{top}'
+        summary = cache.get(key)
+        if summary is None:
+            summary = compute(question, top, archived)
+            cache.set(key, summary, timeout=SUMMARY_TIMEOUT)
+    return summary
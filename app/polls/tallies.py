@@ -0,0 +1,284 @@
+"""
+Incremental maintenance of `QuestionTally`, `OptionTally` and `PollStats` tables.
+
+Every answer write adds (or subtracts) the answer to the counters, so poll results
+and statistics are read from them without scanning `Answer` table. Cached summaries
+of text answers are invalidated when answers are deleted or changed.
+"""
+from collections import Counter
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+
+from django.db.models import Count
+from django.db.models import F
+from django.db.models import Q
+from django.db.models.functions import Greatest
+
+from . import summaries
+from .models import Answer
+from .models import OptionTally
+from .models import Participation
+from .models import PollStats
+from .models import Question
+from .models import QuestionTally
+from .question_cache import question_cache
+
+REBUILD_BATCH_SIZE = 2000
+
+
+def parse_options(question_type, answer):
+    """
+    Returns sorted list of distinct options selected by the answer text.
+    """
+    if question_type not in (Question.SINGLE_OPTION, Question.MULTIPLE_OPTIONS):
+        return []
+    return sorted({int(option) for option in answer.split() if option.isdigit()})
+
+
+def selected_options(answers):
+    """
+    Returns numbers of options linked to saved answers by answer pk (one query for option answers).
+    """
+    pks = [answer.pk for answer in answers if answer.question.type != Question.TEXT]
+    selected = defaultdict(list)
+    if pks:
+        rows = Answer.options.through.objects.filter(answer__in=pks).values_list('answer', 'option__number')
+        for pk, number in rows:
+            selected[pk].append(number)
+    return selected
+
+
+def count(answers, selected=None):
+    """
+    Returns counters of responses by question pk, selected options by (question pk, option)
+    and answered questions by (poll pk, user id). Option numbers of the answers by answer pk
+    are read from saved answers if `selected` isn't given.
+    """
+    if selected is None:
+        selected = selected_options(answers)
+    responses = Counter()
+    options = Counter()
+    participations = Counter()
+    for answer in answers:
+        responses[answer.question_id] += 1
+        for option in selected.get(answer.pk, ()):
+            options[(answer.question_id, option)] += 1
+        participations[(answer.question.poll_id, answer.user_id)] += 1
+    return responses, options, participations
+
+
+def add_answers(answers, selected):
+    """
+    Adds created answers to the counters, `selected` are numbers of their options by answer pk.
+    """
+    _apply(*count(answers, selected), sign=1)
+
+
+def remove_answers(answers):
+    """
+    Subtracts answers from the counters, has to be called before the answers are deleted.
+    """
+    _apply(*count(answers), sign=-1)
+    _invalidate_summaries(answers)
+
+
+def update_answer(old, new, digest):
+    """
+    Applies update of the answer, `old` are counters of `count([answer])` and `digest` is digest of
+    the answer taken before the update.
+    """
+    counters = count([new])
+    for counter, subtracted in zip(counters, old):
+        counter.subtract(subtracted)
+    _apply(*counters)
+    # Summaries are keyed by count of answers, which doesn't change with the text, and moved answer
+    # can bring count of both questions back to already cached values
+    changed = {question for question, delta in counters[0].items() if delta}
+    if new.digest != digest:
+        changed.add(new.question_id)
+    summaries.invalidate(changed)
+
+
+def _invalidate_summaries(answers):
+    summaries.invalidate({answer.question_id for answer in answers if answer.question.type == Question.TEXT})
+
+
+def _group_by_delta(counter, sign):
+    groups = defaultdict(list)
+    for key, delta in counter.items():
+        if delta:
+            groups[delta * sign].append(key)
+    return groups.items()
+
+
+def _add(field, delta):
+    return field + delta if delta > 0 else Greatest(field + delta, 0)
+
+
+def _condition(keys, *fields):
+    return reduce(or_, (Q(**dict(zip(fields, key))) for key in keys))
+
+
+def _apply(responses, options, participations, sign=1):
+    # Rows are updated by F-expression and created with zero count only if absent,
+    # keys with the same delta are updated by one query. Counters are not decreased
+    # below zero: answers written before tallies existed are fixed by `rebuild`.
+    for delta, pks in _group_by_delta(responses, sign):
+        _increment(QuestionTally, ('question_id',), [(pk,) for pk in pks], responses=_add(F('responses'), delta))
+    for delta, keys in _group_by_delta(options, sign):
+        _increment(OptionTally, ('question_id', 'option'), keys, count=_add(F('count'), delta))
+
+    _apply_participations({key: delta * sign for key, delta in participations.items() if delta}, set(responses))
+
+
+def _increment(model, fields, keys, **updates):
+    # Keys are tuples of values of unique `fields`, missing rows are created and updated after
+    # the rows updated by the first query
+    queryset = model.objects.filter(_condition(keys, *fields))
+    if queryset.update(**updates) == len(keys):
+        return
+    existing = set(queryset.values_list(*fields))
+    missing = [key for key in keys if key not in existing]
+    model.objects.bulk_create([model(**dict(zip(fields, key))) for key in missing], ignore_conflicts=True)
+    model.objects.filter(_condition(missing, *fields)).update(**updates)
+
+
+def _apply_participations(participations, questions):
+    # User becomes respondent when answers the first question of the poll and completes
+    # it with the last one. Rows of the users are locked by select before update, missing rows
+    # are created first. Number of questions of the poll is taken from `question_cache` entries
+    # of the answered `questions`.
+    if not participations:
+        return
+    condition = _condition(participations, 'poll_id', 'user_id')
+    stored = _participations(condition)
+    missing = [key for key in participations if key not in stored]
+    if missing:
+        Participation.objects.bulk_create(
+            [Participation(poll_id=poll, user_id=user_id) for poll, user_id in missing], ignore_conflicts=True
+        )
+        stored.update(_participations(_condition(missing, 'poll_id', 'user_id')))
+    for delta, keys in _group_by_delta(participations, 1):
+        Participation.objects.filter(_condition(keys, 'poll_id', 'user_id')).update(answered=_add(F('answered'), delta))
+
+    polls = {poll for poll, _ in participations}
+    sizes = _poll_sizes(questions, polls)
+    respondents = Counter()
+    completions = Counter()
+    for (poll, user_id), delta in participations.items():
+        before = stored[(poll, user_id)]
+        answered = max(before + delta, 0)
+        respondents[poll] += (answered > 0) - (before > 0)
+        completions[poll] += (answered >= sizes.get(poll, 0)) - (before >= sizes.get(poll, 0))
+    deltas = defaultdict(list)
+    for poll in polls:
+        if respondents[poll] or completions[poll]:
+            deltas[(respondents[poll], completions[poll])].append(poll)
+    for (respondents_delta, completions_delta), pks in deltas.items():
+        _update_stats(pks, respondents_delta, completions_delta)
+
+
+def _participations(condition):
+    rows = Participation.objects.select_for_update().filter(condition).values_list('poll', 'user_id', 'answered')
+    return {(poll, user_id): answered for poll, user_id, answered in rows}
+
+
+def _poll_sizes(questions, polls):
+    # Number of questions of the poll is kept by cached entries of its questions
+    sizes = {info.poll_id: info.poll_size for info in question_cache.get_many(questions).values()}
+    missing = set(polls) - set(sizes)
+    if missing:
+        sizes.update(Question.objects.filter(poll__in=missing).order_by().values('poll').annotate(
+            n=Count('id')
+        ).values_list('poll', 'n'))
+    return sizes
+
+
+def _update_stats(polls, respondents, completions):
+    # Single update for existing rows, rows of polls without statistics yet are created first
+    updates = {
+        'respondents': _add(F('respondents'), respondents), 'completions': _add(F('completions'), completions)
+    }
+    if PollStats.objects.filter(poll_id__in=polls).update(**updates) == len(polls):
+        return
+    existing = set(PollStats.objects.filter(poll_id__in=polls).values_list('poll', flat=True))
+    missing = [poll for poll in polls if poll not in existing]
+    PollStats.objects.bulk_create([PollStats(poll_id=poll) for poll in missing], ignore_conflicts=True)
+    PollStats.objects.filter(poll_id__in=missing).update(**updates)
+
+
+def rebuild(polls=None):
+    """
+    Recomputes tallies from `Answer` table and selected options by GROUP BY. If `polls`
+    (list of pk) is given, only questions of these polls are recomputed. Tallies of archived polls
+    are left as is. Has to be called in transaction.
+    """
+    # Answers of archived polls are moved out of `Answer` table, their counters are kept
+    questions = Question.objects.filter(poll__archive__isnull=True)
+    if polls:
+        questions = questions.filter(poll__in=polls)
+    QuestionTally.objects.filter(question__in=questions).delete()
+    OptionTally.objects.filter(question__in=questions).delete()
+
+    responses = Answer.objects.filter(question__in=questions).order_by().values('question').annotate(n=Count('id'))
+    options = Answer.options.through.objects.filter(option__question__in=questions).order_by().values(
+        'option__question', 'option__number'
+    ).annotate(n=Count('id'))
+    responses = {row['question']: row['n'] for row in responses}
+    options = {(row['option__question'], row['option__number']): row['n'] for row in options}
+
+    QuestionTally.objects.bulk_create(
+        [QuestionTally(question_id=pk, responses=n) for pk, n in responses.items()],
+        batch_size=REBUILD_BATCH_SIZE
+    )
+    OptionTally.objects.bulk_create(
+        [OptionTally(question_id=pk, option=option, count=n) for (pk, option), n in options.items()],
+        batch_size=REBUILD_BATCH_SIZE
+    )
+    return len(responses), len(options)
+
+
+def compute_stats(polls=None):
+    """
+    Computes participations {(poll pk, user id): answered questions} and poll statistics
+    {poll pk: (respondents, completions)} from `Answer` table by GROUP BY, archived polls are skipped.
+    """
+    questions = Question.objects.filter(poll__archive__isnull=True)
+    if polls:
+        questions = questions.filter(poll__in=polls)
+    sizes = dict(questions.order_by().values('poll').annotate(n=Count('id')).values_list('poll', 'n'))
+    rows = Answer.objects.filter(question__in=questions).order_by().values('question__poll', 'user_id').annotate(
+        n=Count('id')
+    )
+    participations = {(row['question__poll'], row['user_id']): row['n'] for row in rows}
+    stats = {poll: (0, 0) for poll in sizes}
+    for (poll, _), answered in participations.items():
+        respondents, completions = stats[poll]
+        stats[poll] = (respondents + 1, completions + (answered >= sizes[poll]))
+    return participations, stats
+
+
+def rebuild_stats(polls=None):
+    """
+    Recomputes `Participation` and `PollStats` tables from `Answer` table. Has to be called in transaction.
+    """
+    participations, stats = compute_stats(polls)
+    stored = Participation.objects.filter(poll__archive__isnull=True)
+    stored_stats = PollStats.objects.filter(poll__archive__isnull=True)
+    if polls:
+        stored = stored.filter(poll__in=polls)
+        stored_stats = stored_stats.filter(poll__in=polls)
+    stored.delete()
+    stored_stats.delete()
+
+    Participation.objects.bulk_create(
+        [Participation(poll_id=poll, user_id=user_id, answered=n) for (poll, user_id), n in participations.items()],
+        batch_size=REBUILD_BATCH_SIZE
+    )
+    PollStats.objects.bulk_create(
+        [PollStats(poll_id=poll, respondents=respondents, completions=completions)
+         for poll, (respondents, completions) in stats.items()],
+        batch_size=REBUILD_BATCH_SIZE
+    )
+    return len(stats)
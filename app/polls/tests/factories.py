@@ -2,6 +2,7 @@ import factory
 from datetime import datetime as dt
 from datetime import timedelta as td
 from polls.models import Poll
+from polls.models import Option
 from polls.models import Question
 from polls.models import Answer
 
@@ -24,6 +25,22 @@ class QuestionsFactory(factory.django.DjangoModelFactory):
     type = Question.TEXT
     poll = factory.SubFactory(PollsFactory)
 
+    # Creates options 1-5 for `Single option` and `Multiple options` questions
+    @factory.post_generation
+    def options(obj, create, extracted, **kwargs):
+        if create and obj.type in (Question.SINGLE_OPTION, Question.MULTIPLE_OPTIONS):
+            for number in range(1, 6) if extracted is None else extracted:
+                OptionsFactory.create(question=obj, number=number)
+
+
+class OptionsFactory(factory.django.DjangoModelFactory):
+    class Meta:
+        model = Option
+
+    question = factory.SubFactory(QuestionsFactory, type=Question.SINGLE_OPTION, options=[])
+    number = factory.Sequence(lambda n: n + 1)
+    text = factory.Sequence(lambda n: f'Option_{n}')
+
 
 class AnswersFactory(factory.django.DjangoModelFactory):
     class Meta:
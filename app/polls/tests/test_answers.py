@@ -1,14 +1,21 @@
+import importlib
 import json
+from unittest import mock
 
 import pytest
 
+from django.apps import apps as django_apps
 from django.urls import reverse
 
 from rest_framework import status
 
+from polls.batching import save_answers
 from polls.models import Answer
+from polls.pagination import IdCursorPagination
 from polls.serializers import AnswerSerializer
+from polls.views import AnswerViewSet
 
+from .factories import OptionsFactory
 from .factories import QuestionsFactory
 from .factories import AnswersFactory
 
@@ -23,8 +30,8 @@ def test_get_list_for_concrete_user(api_client, answer_fixture):
     url = reverse(f'{base_url}-list')
     response = api_client.get(url, data={'user_id': expected.get('user_id')})
     assert response.status_code == status.HTTP_200_OK
-    assert len(response.data) == 1
-    assert response.data[0] == expected
+    assert len(response.data['results']) == 1
+    assert response.data['results'][0] == expected
 
 
 @pytest.mark.django_db
@@ -32,7 +39,7 @@ def test_get_list_without_user_empty(api_client, answer_fixture):
     url = reverse(f'{base_url}-list')
     response = api_client.get(url)
     assert response.status_code == status.HTTP_200_OK
-    assert len(response.data) == 0
+    assert len(response.data['results']) == 0
 
 
 @pytest.mark.django_db
@@ -41,7 +48,40 @@ def test_get_list_as_admin(api_client_as_admin, answer_fixture):
     url = reverse(f'{base_url}-list')
     response = api_client_as_admin.get(url)
     assert response.status_code == status.HTTP_200_OK
-    assert response.data == expected
+    assert response.data['results'] == expected
+
+
+@pytest.mark.django_db
+def test_get_list_paginated(api_client_as_admin, answer_fixture):
+    expected = AnswerSerializer(answer_fixture, many=True).data
+    response = api_client_as_admin.get(reverse(f'{base_url}-list'), data={'page_size': 3})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data['previous'] is None
+    assert response.data['results'] == expected[:3]
+    response = api_client_as_admin.get(response.data['next'])
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data['next'] is None
+    assert response.data['results'] == expected[3:]
+
+
+@pytest.mark.django_db
+def test_get_list_page_size_limit(api_client_as_admin, answer_fixture):
+    url = reverse(f'{base_url}-list')
+    with mock.patch.object(IdCursorPagination, 'max_page_size', 2):
+        response = api_client_as_admin.get(url, data={'page_size': 100})
+    assert response.status_code == status.HTTP_200_OK
+    assert len(response.data['results']) == 2
+
+
+@pytest.mark.django_db
+def test_get_list_by_poll(api_client):
+    question = QuestionsFactory.create()
+    other = QuestionsFactory.create()
+    answer = AnswersFactory.create(user_id=1, question=question)
+    AnswersFactory.create(user_id=1, question=other)
+    response = api_client.get(reverse(f'{base_url}-list'), data={'user_id': 1, 'poll': question.poll.pk})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data['results'] == [AnswerSerializer(answer).data]
 
 
 # ===================== GET SINGLE ===================== #
@@ -103,6 +143,322 @@ def test_create(user_id, answer, type, status_code, api_client):
         assert response.data == {**data.__dict__, **{'id': response.data['id']}}
 
 
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    'answer, type, options, status_code', [
+        ('12', 'SO', [12], status.HTTP_201_CREATED),
+        ('1 12', 'MO', [1, 12], status.HTTP_201_CREATED),
+        ('6', 'SO', [1], status.HTTP_400_BAD_REQUEST),
+        ('1 6', 'MO', [1], status.HTTP_400_BAD_REQUEST),
+    ]
+)
+def test_create_options(answer, type, options, status_code, api_client):
+    question = QuestionsFactory.create(type=type, options=options)
+    data = {'user_id': 1, 'question': question.pk, 'answer': answer}
+    response = api_client.post(reverse(f'{base_url}-list'), data=json.dumps(data), content_type='application/json')
+    assert response.status_code == status_code
+    if status_code == status.HTTP_201_CREATED:
+        answer = Answer.objects.get(pk=response.data['id'])
+        assert sorted(option.number for option in answer.options.all()) == options
+
+
+@pytest.mark.django_db
+def test_validate_with_warm_question_cache(django_assert_num_queries):
+    question = QuestionsFactory.create(type='MO')
+    data = {'user_id': 1, 'question': question.pk, 'answer': '1 2'}
+    assert AnswerSerializer(data=data).is_valid()
+    with django_assert_num_queries(0):
+        assert AnswerSerializer(data=data).is_valid()
+
+
+@pytest.mark.django_db
+def test_question_cache_invalidation():
+    question = QuestionsFactory.create(type='SO', options=[1])
+    data = {'user_id': 1, 'question': question.pk, 'answer': '2'}
+    assert not AnswerSerializer(data=data).is_valid()
+    OptionsFactory.create(question=question, number=2)
+    assert AnswerSerializer(data=data).is_valid()
+    question.type = 'TX'
+    question.save()
+    assert AnswerSerializer(data={**data, 'answer': 'Text'}).is_valid()
+    question.delete()
+    assert not AnswerSerializer(data=data).is_valid()
+
+
+@pytest.mark.django_db
+def test_options_migration():
+    migration = importlib.import_module('polls.migrations.0004_options')
+    unanswered = QuestionsFactory.create(type='SO', options=[])
+    question = QuestionsFactory.create(type='MO', options=[])
+    answer = AnswersFactory.create(question=question, answer='1 7')
+    migration.link_answer_options(django_apps, None)
+    # Every single digit accepted before options existed stays valid
+    assert sorted(unanswered.options.values_list('number', flat=True)) == list(range(10))
+    assert sorted(question.options.values_list('number', flat=True)) == list(range(10))
+    assert sorted(answer.options.values_list('number', flat=True)) == [1, 7]
+    assert AnswerSerializer(data={'user_id': 1, 'question': unanswered.pk, 'answer': '3'}).is_valid()
+
+
+# ===================== BULK CREATE ===================== #
+
+@pytest.mark.django_db
+def test_bulk_create(api_client, django_assert_max_num_queries):
+    questions = [QuestionsFactory.create(type=type) for type in ('TX', 'SO', 'MO')]
+    data = [
+        {'user_id': 1, 'question': questions[0].pk, 'answer': 'Test_answer'},
+        {'user_id': 1, 'question': questions[1].pk, 'answer': '1'},
+        {'user_id': 1, 'question': questions[2].pk, 'answer': '1 2 3'},
+    ]
+    # Load questions with options, insert answers and selected options, upsert question and option tallies,
+    # upsert participations and poll stats, transaction savepoints and fetch of pk on backends which don't
+    # return them from bulk insert
+    with django_assert_max_num_queries(17):
+        response = api_client.post(
+            reverse(f'{base_url}-bulk'),
+            data=json.dumps(data),
+            content_type='application/json'
+        )
+    assert response.status_code == status.HTTP_201_CREATED
+    assert Answer.objects.count() == len(data)
+    assert response.data == AnswerSerializer(Answer.objects.order_by('pk'), many=True).data
+    assert [option.number for option in Answer.objects.get(question=questions[2]).options.order_by('number')] == [1, 2, 3]
+
+
+@pytest.mark.django_db
+def test_bulk_create_invalid_items(api_client):
+    questions = [QuestionsFactory.create(type=type) for type in ('TX', 'SO')]
+    data = [
+        {'user_id': 1, 'question': questions[0].pk, 'answer': 'Test_answer'},
+        {'user_id': 1, 'question': questions[1].pk, 'answer': 'Text'},
+        {'user_id': 1, 'question': 99, 'answer': 'Text'},
+    ]
+    response = api_client.post(
+        reverse(f'{base_url}-bulk'),
+        data=json.dumps(data),
+        content_type='application/json'
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.data[0] == {}
+    assert 'non_field_errors' in response.data[1]
+    assert 'question' in response.data[2]
+    assert Answer.objects.count() == 0
+
+
+@pytest.mark.django_db
+def test_bulk_create_too_many(api_client, settings):
+    settings.ANSWERS_BULK_MAX_SIZE = 2
+    question = QuestionsFactory.create()
+    data = [{'user_id': user_id, 'question': question.pk, 'answer': 'Answer'} for user_id in range(3)]
+    response = api_client.post(
+        reverse(f'{base_url}-bulk'),
+        data=json.dumps(data),
+        content_type='application/json'
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.data == ['Ensure this list has no more than 2 answers']
+    assert Answer.objects.count() == 0
+    response = api_client.post(
+        reverse(f'{base_url}-bulk'),
+        data=json.dumps(data[:2]),
+        content_type='application/json'
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+
+
+@pytest.mark.django_db
+def test_bulk_create_duplicates(api_client):
+    question = QuestionsFactory.create()
+    AnswersFactory.create(user_id=1, question=question)
+    data = [
+        {'user_id': 1, 'question': question.pk, 'answer': 'Answer'},
+        {'user_id': 2, 'question': question.pk, 'answer': 'Answer'},
+        {'user_id': 2, 'question': question.pk, 'answer': 'Answer'},
+    ]
+    response = api_client.post(
+        reverse(f'{base_url}-bulk'),
+        data=json.dumps(data),
+        content_type='application/json'
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.data[0] == {}
+    assert response.data[1] == {}
+    assert 'non_field_errors' in response.data[2]
+    response = api_client.post(
+        reverse(f'{base_url}-bulk'),
+        data=json.dumps(data[:2]),
+        content_type='application/json'
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert 'non_field_errors' in response.data[0]
+    assert response.data[1] == {}
+    assert Answer.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_create_duplicate(api_client):
+    answer = AnswersFactory.create()
+    data = {'user_id': answer.user_id, 'question': answer.question.pk, 'answer': 'Answer'}
+    response = api_client.post(reverse(f'{base_url}-list'), data=json.dumps(data), content_type='application/json')
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert Answer.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_create_repeated(api_client):
+    question = QuestionsFactory.create(type='SO')
+    data = {'user_id': 1, 'question': question.pk, 'answer': '2'}
+    url = reverse(f'{base_url}-list')
+    created = api_client.post(url, data=json.dumps(data), content_type='application/json')
+    assert created.status_code == status.HTTP_201_CREATED
+    response = api_client.post(url, data=json.dumps(data), content_type='application/json')
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data == created.data
+    assert Answer.objects.count() == 1
+    assert question.tally.responses == 1
+
+
+@pytest.mark.django_db
+def test_create_idempotency_key(api_client, django_assert_num_queries):
+    question = QuestionsFactory.create()
+    data = {'user_id': 1, 'question': question.pk, 'answer': 'Answer'}
+    url = reverse(f'{base_url}-list')
+    created = api_client.post(url, data=json.dumps(data), content_type='application/json', HTTP_IDEMPOTENCY_KEY='k1')
+    assert created.status_code == status.HTTP_201_CREATED
+    with django_assert_num_queries(0):
+        response = api_client.post(
+            url, data=json.dumps(data), content_type='application/json', HTTP_IDEMPOTENCY_KEY='k1'
+        )
+    assert response.status_code == status.HTTP_201_CREATED
+    assert response['Idempotent-Replayed'] == 'true'
+    assert response.data == created.data
+    data['answer'] = 'Other'
+    response = api_client.post(url, data=json.dumps(data), content_type='application/json', HTTP_IDEMPOTENCY_KEY='k1')
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    response = api_client.post(url, data=json.dumps(data), content_type='application/json', HTTP_IDEMPOTENCY_KEY='k2')
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert Answer.objects.get().answer == 'Answer'
+
+
+@pytest.mark.django_db
+def test_idempotency_key_scoped_by_client(api_client):
+    question = QuestionsFactory.create()
+    url = reverse(f'{base_url}-list')
+    for user_id in (1, 2):
+        data = {'user_id': user_id, 'question': question.pk, 'answer': 'Answer'}
+        response = api_client.post(url, data=json.dumps(data), content_type='application/json', HTTP_IDEMPOTENCY_KEY='k1')
+        assert response.status_code == status.HTTP_201_CREATED
+        assert not response.has_header('Idempotent-Replayed')
+    assert Answer.objects.count() == 2
+
+
+@pytest.mark.django_db
+def test_idempotency_key_in_progress(api_client):
+    question = QuestionsFactory.create()
+    data = {'user_id': 1, 'question': question.pk, 'answer': 'Answer'}
+    url = reverse(f'{base_url}-list')
+    responses = []
+
+    def create_answer(view, request):
+        # Retry arrives while the first request is in progress
+        responses.append(api_client.post(
+            url, data=json.dumps(data), content_type='application/json', HTTP_IDEMPOTENCY_KEY='k1'
+        ))
+        return create(view, request)
+
+    create = AnswerViewSet.create_answer
+    with mock.patch.object(AnswerViewSet, 'create_answer', create_answer):
+        response = api_client.post(url, data=json.dumps(data), content_type='application/json', HTTP_IDEMPOTENCY_KEY='k1')
+    assert response.status_code == status.HTTP_201_CREATED
+    assert responses[0].status_code == status.HTTP_409_CONFLICT
+    assert Answer.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_idempotency_key_released_on_failure(api_client):
+    question = QuestionsFactory.create(type='SO')
+    data = {'user_id': 1, 'question': question.pk, 'answer': 'Text'}
+    url = reverse(f'{base_url}-list')
+    response = api_client.post(url, data=json.dumps(data), content_type='application/json', HTTP_IDEMPOTENCY_KEY='k1')
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    data['answer'] = '1'
+    response = api_client.post(url, data=json.dumps(data), content_type='application/json', HTTP_IDEMPOTENCY_KEY='k1')
+    assert response.status_code == status.HTTP_201_CREATED
+
+
+# ===================== ASYNC CREATE ===================== #
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    'answer, type, status_code', [
+        ('Test_answer', 'TX', status.HTTP_201_CREATED),
+        ('1 2 3', 'MO', status.HTTP_201_CREATED),
+        ('Text', 'SO', status.HTTP_400_BAD_REQUEST),
+    ]
+)
+def test_create_async(answer, type, status_code, api_client):
+    question = QuestionsFactory.create(type=type)
+    data = {'user_id': 1, 'question': question.pk, 'answer': answer}
+    response = api_client.post(reverse(f'{base_url}-async'), data=json.dumps(data), content_type='application/json')
+    assert response.status_code == status_code
+    if status_code == status.HTTP_201_CREATED:
+        assert response.json() == {**data, 'id': Answer.objects.get().pk}
+    else:
+        assert Answer.objects.count() == 0
+
+
+@pytest.mark.django_db
+def test_save_answers_batch():
+    question = QuestionsFactory.create(type='SO')
+    items = [
+        {'user_id': 1, 'question': question.pk, 'answer': '1'},
+        {'user_id': 2, 'question': question.pk, 'answer': 'Text'},
+        {'user_id': 1, 'question': question.pk, 'answer': '2'},
+        {'user_id': 3, 'question': question.pk, 'answer': '3'},
+    ]
+    results = save_answers(items)
+    assert [status_code for status_code, _ in results] == [
+        status.HTTP_201_CREATED, status.HTTP_400_BAD_REQUEST, status.HTTP_400_BAD_REQUEST, status.HTTP_201_CREATED
+    ]
+    assert results[3][1] == AnswerSerializer(Answer.objects.get(user_id=3)).data
+    assert Answer.objects.count() == 2
+
+
+@pytest.mark.django_db
+def test_save_answers_repeated():
+    question = QuestionsFactory.create(type='SO')
+    stored = AnswersFactory.create(user_id=1, question=question, answer='1')
+    items = [
+        {'user_id': 1, 'question': question.pk, 'answer': '1'},
+        {'user_id': 2, 'question': question.pk, 'answer': '2'},
+        {'user_id': 2, 'question': question.pk, 'answer': '2'},
+        {'user_id': 1, 'question': question.pk, 'answer': '2'},
+    ]
+    results = save_answers(items)
+    assert [status_code for status_code, _ in results] == [
+        status.HTTP_200_OK, status.HTTP_201_CREATED, status.HTTP_200_OK, status.HTTP_400_BAD_REQUEST
+    ]
+    assert results[0][1] == AnswerSerializer(stored).data
+    assert results[2][1] == results[1][1]
+    assert Answer.objects.count() == 2
+
+
+@pytest.mark.django_db
+def test_create_async_idempotency_key(api_client):
+    question = QuestionsFactory.create()
+    data = {'user_id': 1, 'question': question.pk, 'answer': 'Answer'}
+    url = reverse(f'{base_url}-async')
+    created = api_client.post(url, data=json.dumps(data), content_type='application/json', HTTP_IDEMPOTENCY_KEY='k1')
+    assert created.status_code == status.HTTP_201_CREATED
+    response = api_client.post(url, data=json.dumps(data), content_type='application/json', HTTP_IDEMPOTENCY_KEY='k1')
+    assert response.status_code == status.HTTP_201_CREATED
+    assert response['Idempotent-Replayed'] == 'true'
+    assert response.json() == created.json()
+    data['answer'] = 'Other'
+    response = api_client.post(url, data=json.dumps(data), content_type='application/json', HTTP_IDEMPOTENCY_KEY='k1')
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert Answer.objects.get().answer == 'Answer'
+
+
 # ======================  UPDATE ==================== #
 
 @pytest.mark.django_db
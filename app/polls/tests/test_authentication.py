@@ -0,0 +1,59 @@
+import pickle
+
+import pytest
+
+from django.core.cache import cache
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework_simplejwt.tokens import AccessToken
+
+from polls.authentication import user_cache_key
+from polls.tests.factories import AnswersFactory
+
+
+def obtain_token(api_client, admin_user):
+    response = api_client.post(reverse('token_obtain_pair'), data={'username': admin_user.username, 'password': 'password'})
+    assert response.status_code == status.HTTP_200_OK
+    return response.data['access']
+
+
+@pytest.mark.django_db
+def test_token_has_staff_claim(api_client, admin_user):
+    assert AccessToken(obtain_token(api_client, admin_user))['is_staff'] is True
+
+
+@pytest.mark.django_db
+def test_user_cached(api_client, admin_user, django_assert_num_queries):
+    AnswersFactory.create_batch(2)
+    api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {obtain_token(api_client, admin_user)}')
+    url = reverse('answers-list')
+    # User and answers
+    with django_assert_num_queries(2):
+        response = api_client.get(url)
+    assert len(response.data['results']) == 2
+    # Answers only
+    with django_assert_num_queries(1):
+        response = api_client.get(url)
+    assert len(response.data['results']) == 2
+    # Password hash isn't put into the cache
+    assert admin_user.password.encode() not in pickle.dumps(cache.get(user_cache_key(admin_user.pk)))
+    admin_user.is_active = False
+    admin_user.save()
+    assert api_client.get(url).status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.django_db
+def test_stateless_user(api_client, admin_user, settings, django_assert_num_queries):
+    settings.JWT_STATELESS_USER = True
+    AnswersFactory.create_batch(2)
+    api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {obtain_token(api_client, admin_user)}')
+    with django_assert_num_queries(1):
+        response = api_client.get(reverse('answers-list'))
+    assert len(response.data['results']) == 2
+
+
+@pytest.mark.django_db
+def test_invalid_token(api_client, poll_fixture):
+    api_client.credentials(HTTP_AUTHORIZATION='Bearer invalid')
+    assert api_client.get(reverse('polls-list')).status_code == status.HTTP_401_UNAUTHORIZED
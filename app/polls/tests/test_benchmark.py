@@ -0,0 +1,40 @@
+import json
+
+import pytest
+
+from django.core.management import call_command
+
+from polls.models import Answer
+from polls.models import Option
+from polls.models import Poll
+from polls.models import PollStats
+from polls.models import Question
+from polls.models import QuestionTally
+
+
+@pytest.mark.django_db
+def test_seed_data():
+    call_command('seed_data', polls=2, questions=3, users=4, polls_per_user=1, batch_size=5)
+    assert Poll.objects.count() == 2
+    assert Question.objects.count() == 6
+    assert Option.objects.count() == 5 * Question.objects.exclude(type=Question.TEXT).count()
+    assert Answer.objects.count() == 4 * 3
+    assert Answer.options.through.objects.count() >= Answer.objects.exclude(question__type=Question.TEXT).count()
+    assert sum(QuestionTally.objects.values_list('responses', flat=True)) == 4 * 3
+    assert sum(PollStats.objects.values_list('respondents', flat=True)) == 4
+
+
+@pytest.mark.django_db(transaction=True)
+def test_benchmark(live_server, admin_user, tmp_path):
+    call_command('seed_data', polls=1, questions=2, users=2, polls_per_user=1, seed=1)
+    output = tmp_path / 'results.json'
+    call_command('benchmark', base_url=live_server.url, requests=4, warmup=1, concurrency=1, output=str(output))
+    results = json.loads(output.read_text())
+    assert set(results['scenarios']) == {'poll_list', 'question_fetch', 'answer_submit', 'admin_answer_list'}
+    for result in results['scenarios'].values():
+        assert result['requests'] == 4
+        assert result['errors'] == 0
+        assert result['p50_ms'] <= result['p99_ms']
+    # Active polls are served from cache after warmup, submitted answer is saved
+    assert results['scenarios']['poll_list']['queries'] == 0
+    assert results['scenarios']['answer_submit']['queries'] > 0
@@ -0,0 +1,73 @@
+import asyncio
+from unittest import mock
+
+import pytest
+
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient
+from django.test import override_settings
+from django.urls import reverse
+
+from rest_framework import status
+
+from polls.metrics import registry
+
+from .factories import QuestionsFactory
+
+
+@pytest.fixture(autouse=True)
+def clear_metrics():
+    registry.clear()
+    yield
+    registry.clear()
+
+
+@pytest.mark.django_db
+def test_server_timing(api_client):
+    question = QuestionsFactory.create()
+    response = api_client.get(reverse('questions-detail', kwargs={'pk': question.pk}))
+    assert response.status_code == status.HTTP_200_OK
+    assert response['Server-Timing'].startswith('db;dur=')
+    assert 'queries", total;dur=' in response['Server-Timing']
+
+
+@pytest.mark.django_db
+def test_metrics(api_client):
+    question = QuestionsFactory.create()
+    api_client.get(reverse('questions-detail', kwargs={'pk': question.pk}))
+    api_client.get(reverse('questions-detail', kwargs={'pk': 0}))
+    response = api_client.get(reverse('metrics'))
+    assert response.status_code == status.HTTP_200_OK
+    assert response['Content-Type'].startswith('text/plain; version=0.0.4')
+    text = response.content.decode()
+    assert '# TYPE http_request_duration_seconds histogram' in text
+    assert 'http_request_duration_seconds_count{route="questions-detail"} 2' in text
+    assert 'http_request_duration_seconds_bucket{route="questions-detail",le="+Inf"} 2' in text
+    assert 'db_queries_per_request_bucket{route="questions-detail",le="0"} 0' in text
+    assert 'http_requests_total{route="questions-detail",method="GET",status="200"} 1' in text
+    assert 'http_requests_total{route="questions-detail",method="GET",status="404"} 1' in text
+
+
+@pytest.mark.django_db
+@override_settings(ASYNC_ANSWERS_BATCH_DELAY=0.2)
+def test_async_requests_not_serialized():
+    batches = []
+
+    def save_answers(items):
+        batches.append(len(items))
+        return [(status.HTTP_201_CREATED, item) for item in items]
+
+    async def submit():
+        client = AsyncClient()
+        return await asyncio.gather(*[
+            client.post(reverse('answers-async'), {'user_id': user_id, 'question': 1, 'answer': 'Answer'},
+                        content_type='application/json')
+            for user_id in range(20)
+        ])
+
+    with mock.patch('polls.batching.save_answers', save_answers):
+        responses = async_to_sync(submit)()
+    assert [response.status_code for response in responses] == [status.HTTP_201_CREATED] * 20
+    assert batches == [20]
+    assert responses[0]['Server-Timing'].startswith('total;dur=')
+    assert 'http_requests_total{route="answers-async",method="POST",status="201"} 20' in registry.render()
@@ -0,0 +1,56 @@
+import json
+
+import pytest
+
+from django.urls import reverse
+
+from rest_framework import status
+
+from polls.models import Option
+from polls.serializers import OptionSerializer
+
+from .factories import OptionsFactory
+from .factories import QuestionsFactory
+
+base_url = 'options'
+
+
+@pytest.mark.django_db
+def test_get_list_by_question(api_client):
+    question = QuestionsFactory.create(type='SO', options=[1, 2])
+    OptionsFactory.create_batch(2)
+    expected = OptionSerializer(Option.objects.filter(question=question).order_by('id'), many=True).data
+    response = api_client.get(reverse(f'{base_url}-list'), data={'question': question.pk})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data['results'] == expected
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    'number, text, status_code', [
+        (3, 'Option', status.HTTP_201_CREATED),
+        (3, '', status.HTTP_201_CREATED),
+        (1, 'Option', status.HTTP_400_BAD_REQUEST),
+        (-1, 'Option', status.HTTP_400_BAD_REQUEST),
+    ]
+)
+def test_create_authorized(number, text, status_code, api_client_as_admin):
+    question = QuestionsFactory.create(type='SO', options=[1, 2])
+    data = {'question': question.pk, 'number': number, 'text': text}
+    response = api_client_as_admin.post(
+        reverse(f'{base_url}-list'),
+        data=json.dumps(data),
+        content_type='application/json'
+    )
+    assert response.status_code == status_code
+
+
+@pytest.mark.django_db
+def test_create_unauthorized(api_client):
+    question = QuestionsFactory.create(type='SO', options=[])
+    response = api_client.post(
+        reverse(f'{base_url}-list'),
+        data=json.dumps({'question': question.pk, 'number': 1, 'text': 'Option'}),
+        content_type='application/json'
+    )
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
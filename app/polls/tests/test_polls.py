@@ -1,17 +1,28 @@
 import json
 from datetime import datetime as dt
+from datetime import timedelta as td
+from io import StringIO
 
 import pytest
 
+from django.core.management import call_command
+from django.db.models import F
 from django.db.models import Q
 from django.urls import reverse
+from django.utils import timezone
 
 from rest_framework import status
+from rest_framework.test import APIClient
 
+from polls import activation
 from polls.models import Poll
+from polls.models import Question
 from polls.serializers import PollSerializer
+from polls.serializers import QuestionSerializer
 
+from .factories import AnswersFactory
 from .factories import PollsFactory
+from .factories import QuestionsFactory
 
 
 base_url = 'polls'
@@ -25,7 +36,7 @@ def test_get_list_unauthorized(api_client, poll_fixture):
     url = reverse(f'{base_url}-list')
     response = api_client.get(url)
     assert response.status_code == status.HTTP_200_OK
-    assert response.data == expected
+    assert response.json()['results'] == expected
 
 
 @pytest.mark.django_db
@@ -34,7 +45,76 @@ def test_get_list_as_admin(api_client_as_admin, poll_fixture):
     url = reverse(f'{base_url}-list')
     response = api_client_as_admin.get(url)
     assert response.status_code == status.HTTP_200_OK
-    assert response.data == expected
+    assert response.data['results'] == expected
+
+@pytest.mark.django_db
+def test_get_list_cached(api_client, poll_fixture, django_assert_num_queries):
+    url = reverse(f'{base_url}-list')
+    response = api_client.get(url)
+    assert response.status_code == status.HTTP_200_OK
+    with django_assert_num_queries(0):
+        cached = api_client.get(url)
+    assert cached.status_code == status.HTTP_200_OK
+    assert cached.content == response.content
+    assert cached['ETag'] == response['ETag']
+    PollsFactory.create(start_date='2020-01-01', end_date='2100-01-01')
+    response = api_client.get(url)
+    assert response['ETag'] != cached['ETag']
+    assert len(response.json()['results']) == len(cached.json()['results']) + 1
+
+
+@pytest.mark.django_db
+def test_get_list_cached_by_host(api_client, settings):
+    settings.ALLOWED_HOSTS = ['one.example', 'two.example']
+    PollsFactory.create_batch(2, start_date='2020-01-01', end_date='2100-01-01')
+    url = reverse(f'{base_url}-list')
+    response = api_client.get(url, {'page_size': 1}, HTTP_HOST='one.example')
+    assert response.json()['next'].startswith('http://one.example/')
+    # Links of the cached response are absolute, so other host and scheme get their own entry
+    response = api_client.get(url, {'page_size': 1}, HTTP_HOST='two.example', secure=True)
+    assert response.json()['next'].startswith('https://two.example/')
+    # Browsable API isn't cached, its markup depends on the user
+    response = api_client.get(url, HTTP_HOST='two.example', HTTP_ACCEPT='text/html')
+    assert response.status_code == status.HTTP_200_OK
+    assert not response.has_header('ETag')
+
+
+@pytest.mark.django_db
+def test_get_list_not_modified(api_client, poll_fixture):
+    url = reverse(f'{base_url}-list')
+    response = api_client.get(url)
+    response = api_client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.content == b''
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('polls_count', [1, 5])
+def test_get_list_expand_questions(polls_count, api_client_as_admin, django_assert_num_queries):
+    for poll in PollsFactory.create_batch(polls_count):
+        QuestionsFactory.create_batch(3, poll=poll)
+    url = reverse(f'{base_url}-list')
+    # Polls and questions of all polls
+    with django_assert_num_queries(2):
+        response = api_client_as_admin.get(url, data={'expand': 'questions'})
+    assert response.status_code == status.HTTP_200_OK
+    for poll in response.data['results']:
+        expected = QuestionSerializer(Question.objects.filter(poll=poll['id']).order_by('id'), many=True).data
+        assert poll['questions'] == expected
+
+
+@pytest.mark.django_db
+def test_get_single_expand_questions(api_client, question_fixture):
+    poll = question_fixture[0].poll
+    poll.start_date, poll.end_date = '2020-01-01', '2100-01-01'
+    poll.save()
+    url = reverse(f'{base_url}-detail', kwargs={'pk': poll.pk})
+    response = api_client.get(url, data={'expand': 'questions'})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data['questions'] == QuestionSerializer([question_fixture[0]], many=True).data
+    response = api_client.get(url)
+    assert 'questions' not in response.data
+
 
 # ===================== GET SINGLE ===================== #
 
@@ -55,6 +135,58 @@ def test_get_single_invalid(api_client_as_admin, poll_fixture):
     assert response.status_code == status.HTTP_404_NOT_FOUND
 
 
+@pytest.mark.django_db
+def test_get_single_not_modified(api_client, django_assert_num_queries):
+    poll = PollsFactory.create(start_date='2020-01-01', end_date='2100-01-01')
+    url = reverse(f'{base_url}-detail', kwargs={'pk': poll.pk})
+    response = api_client.get(url)
+    assert response.status_code == status.HTTP_200_OK
+    etag = response['ETag']
+    # Only version of the poll is queried
+    with django_assert_num_queries(1):
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response['ETag'] == etag
+    # Version bumped by other worker is seen at once
+    Poll.objects.filter(pk=poll.pk).update(version=F('version') + 1)
+    response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == status.HTTP_200_OK
+    etag = response['ETag']
+    QuestionsFactory.create(poll=poll)
+    response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == status.HTTP_200_OK
+    assert response['ETag'] != etag
+    poll.description = 'Changed'
+    poll.save()
+    assert api_client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code == status.HTTP_200_OK
+
+
+@pytest.mark.django_db
+def test_get_single_saved_twice(api_client):
+    poll = PollsFactory.create(start_date='2020-01-01', end_date='2100-01-01')
+    url = reverse(f'{base_url}-detail', kwargs={'pk': poll.pk})
+    poll.description = 'A'
+    poll.save()
+    etag = api_client.get(url)['ETag']
+    # Stale version of the instance isn't written back over the bumped one
+    poll.description = 'B'
+    poll.save()
+    response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data['description'] == 'B'
+    assert poll.version == Poll.objects.get(pk=poll.pk).version == 3
+
+
+@pytest.mark.django_db
+def test_get_single_not_modified_inactive(api_client_as_admin):
+    poll = PollsFactory.create(start_date='2020-01-01', end_date='2020-02-01')
+    url = reverse(f'{base_url}-detail', kwargs={'pk': poll.pk})
+    etag = api_client_as_admin.get(url)['ETag']
+    # Inactive poll is not found by non-staff user even with matching ETag
+    response = APIClient().get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
 # ===================== CREATE ===================== #
 
 @pytest.mark.django_db
@@ -153,3 +285,118 @@ def test_invalid_delete_poll(api_client_as_admin, poll_fixture):
     url = reverse(f'{base_url}-detail', kwargs={'pk': 99})
     response = api_client_as_admin.delete(url)
     assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+# ======================  EXPORT ==================== #
+
+@pytest.mark.django_db
+def test_export_csv(api_client_as_admin, answer_fixture):
+    poll = answer_fixture[0].question.poll
+    url = reverse(f'{base_url}-export', kwargs={'pk': poll.pk})
+    response = api_client_as_admin.get(url, data={'format': 'csv'})
+    assert response.status_code == status.HTTP_200_OK
+    assert response['Content-Type'] == 'text/csv; charset=utf-8'
+    lines = b''.join(response.streaming_content).decode().splitlines()
+    answer = answer_fixture[0]
+    assert lines == [
+        'id,user_id,question,question_type,answer',
+        f'{answer.pk},{answer.user_id},{answer.question.pk},{answer.question.type},{answer.answer}',
+    ]
+
+
+@pytest.mark.django_db
+def test_export_ndjson(api_client_as_admin, answer_fixture):
+    poll = answer_fixture[0].question.poll
+    url = reverse(f'{base_url}-export', kwargs={'pk': poll.pk})
+    response = api_client_as_admin.get(url, data={'format': 'ndjson'})
+    assert response.status_code == status.HTTP_200_OK
+    lines = b''.join(response.streaming_content).decode().splitlines()
+    answer = answer_fixture[0]
+    assert [json.loads(line) for line in lines] == [{
+        'id': answer.pk, 'user_id': answer.user_id, 'question': answer.question.pk,
+        'question_type': answer.question.type, 'answer': answer.answer,
+    }]
+
+
+@pytest.mark.django_db
+def test_export_unauthorized(api_client, answer_fixture):
+    url = reverse(f'{base_url}-export', kwargs={'pk': answer_fixture[0].question.poll.pk})
+    response = api_client.get(url, data={'format': 'csv'})
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+# ======================  PROGRESS ==================== #
+
+@pytest.mark.django_db
+def test_progress(api_client, django_assert_num_queries):
+    poll = PollsFactory.create(start_date='2020-01-01', end_date='2100-01-01')
+    questions = QuestionsFactory.create_batch(3, poll=poll)
+    answer = AnswersFactory.create(user_id=1, question=questions[1], answer='Text')
+    AnswersFactory.create(user_id=2, question=questions[0])
+    url = reverse(f'{base_url}-progress', kwargs={'pk': poll.pk})
+    with django_assert_num_queries(1):
+        response = api_client.get(url, data={'user_id': 1})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data == {
+        'poll': poll.pk,
+        'user_id': 1,
+        'answered': [questions[1].pk],
+        'unanswered': [questions[0].pk, questions[2].pk],
+        'answers': [{'id': answer.pk, 'user_id': 1, 'question': questions[1].pk, 'answer': 'Text'}],
+    }
+
+
+@pytest.mark.django_db
+def test_progress_invalid(api_client):
+    poll = PollsFactory.create(start_date='2020-01-01', end_date='2100-01-01')
+    url = reverse(f'{base_url}-progress', kwargs={'pk': poll.pk})
+    assert api_client.get(url).status_code == status.HTTP_400_BAD_REQUEST
+    response = api_client.get(url, data={'user_id': 1})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data['unanswered'] == []
+    url = reverse(f'{base_url}-progress', kwargs={'pk': 99})
+    assert api_client.get(url, data={'user_id': 1}).status_code == status.HTTP_404_NOT_FOUND
+
+
+# ======================  ACTIVATION ==================== #
+
+@pytest.mark.django_db
+def test_is_active_on_save():
+    today = timezone.localdate()
+    assert PollsFactory.create(start_date=today, end_date=today + td(days=1)).is_active
+    assert not PollsFactory.create(start_date=today + td(days=1), end_date=today + td(days=2)).is_active
+    assert not PollsFactory.create(start_date=today - td(days=2), end_date=today - td(days=1)).is_active
+
+
+@pytest.mark.django_db
+def test_update_active_polls(api_client, django_assert_num_queries):
+    today = timezone.localdate()
+    starting = PollsFactory.create(start_date=today + td(days=1), end_date=today + td(days=2))
+    ending = PollsFactory.create(start_date=today - td(days=1), end_date=today)
+    url = reverse(f'{base_url}-list')
+    assert [poll['id'] for poll in api_client.get(url).json()['results']] == [ending.pk]
+    detail = api_client.get(reverse(f'{base_url}-detail', kwargs={'pk': ending.pk}))
+
+    activated, deactivated = activation.update_active_polls(today + td(days=1))
+    assert (activated, deactivated) == ([starting.pk], [ending.pk])
+    assert activation.update_active_polls(today + td(days=1)) == ([], [])
+    # Cached list is keyed by host of the requests
+    assert activation.warm_active_polls('testserver') == status.HTTP_200_OK
+    with django_assert_num_queries(0):
+        response = api_client.get(url)
+    assert [poll['id'] for poll in response.json()['results']] == [starting.pk]
+    response = api_client.get(reverse(f'{base_url}-detail', kwargs={'pk': ending.pk}), HTTP_IF_NONE_MATCH=detail['ETag'])
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+def test_activate_polls_command():
+    today = timezone.localdate()
+    poll = PollsFactory.create(start_date=today, end_date=today + td(days=1))
+    Poll.objects.filter(pk=poll.pk).update(is_active=False)
+    out = StringIO()
+    err = StringIO()
+    call_command('activate_polls', stdout=out, stderr=err)
+    assert 'activated 1 polls, deactivated 0 polls' in out.getvalue()
+    assert 'Local memory cache is not shared' in err.getvalue()
+    assert Poll.objects.get(pk=poll.pk).is_active
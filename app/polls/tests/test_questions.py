@@ -1,14 +1,18 @@
 import json
+from unittest import mock
 
 import pytest
 
+from django.core.cache import cache
 from django.urls import reverse
 
 from rest_framework import status
+from rest_framework.test import APIClient
 
 from polls.models import Question
 from polls.serializers import QuestionSerializer
 
+from .factories import AnswersFactory
 from .factories import QuestionsFactory
 from .factories import PollsFactory
 
@@ -21,7 +25,7 @@ def test_get_list(api_client, question_fixture):
     url = reverse(f'{base_url}-list')
     response = api_client.get(url)
     assert response.status_code == status.HTTP_200_OK
-    assert response.data == expected
+    assert response.data['results'] == expected
 
 
 @pytest.mark.django_db
@@ -31,7 +35,7 @@ def test_get_list_by_poll(api_client, question_fixture):
     url = reverse(f'{base_url}-list')
     response = api_client.get(url, data={'poll': poll_pk})
     assert response.status_code == status.HTTP_200_OK
-    assert response.data == expected
+    assert response.data['results'] == expected
 
 
 # ===================== GET SINGLE ===================== #
@@ -53,6 +57,28 @@ def test_get_single_invalid(api_client_as_admin, question_fixture):
     assert response.status_code == status.HTTP_404_NOT_FOUND
 
 
+@pytest.mark.django_db
+def test_get_not_modified(api_client, django_assert_num_queries):
+    question = QuestionsFactory.create(type='SO')
+    list_url = reverse(f'{base_url}-list')
+    detail_url = reverse(f'{base_url}-detail', kwargs={'pk': question.pk})
+    listed = api_client.get(list_url, data={'poll': question.poll.pk})
+    detail = api_client.get(detail_url)
+    assert listed['ETag'] != detail['ETag']
+    # Only version of the poll is queried
+    with django_assert_num_queries(1):
+        response = api_client.get(list_url, data={'poll': question.poll.pk}, HTTP_IF_NONE_MATCH=listed['ETag'])
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    with django_assert_num_queries(1):
+        response = api_client.get(detail_url, HTTP_IF_NONE_MATCH=detail['ETag'])
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    option = question.options.first()
+    option.text = 'Changed'
+    option.save()
+    response = api_client.get(detail_url, HTTP_IF_NONE_MATCH=detail['ETag'])
+    assert response.status_code == status.HTTP_200_OK
+
+
 # ===================== CREATE ===================== #
 
 @pytest.mark.django_db
@@ -151,3 +177,89 @@ def test_delete_invalid(api_client_as_admin, question_fixture):
     url = reverse(f'{base_url}-detail', kwargs={'pk': 99})
     response = api_client_as_admin.delete(url)
     assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+# ======================  SUMMARY ==================== #
+
+@pytest.mark.django_db
+def test_summary(api_client, api_client_as_admin, django_assert_num_queries):
+    question = QuestionsFactory.create(type='TX')
+    data = [
+        {'user_id': 1, 'question': question.pk, 'answer': 'Yes'},
+        {'user_id': 2, 'question': question.pk, 'answer': ' yes  '},
+        {'user_id': 3, 'question': question.pk, 'answer': 'No  idea'},
+    ]
+    response = api_client.post(reverse('answers-bulk'), data=json.dumps(data), content_type='application/json')
+    assert response.status_code == status.HTTP_201_CREATED
+    AnswersFactory.create(user_id=4, question=question, answer='no IDEA')
+    AnswersFactory.create(user_id=5, question=question, answer='Maybe')
+    AnswersFactory.create(user_id=6, question=question, answer='YES')
+    url = reverse(f'{base_url}-summary', kwargs={'pk': question.pk})
+    response = api_client_as_admin.get(url, data={'top': 2})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data == {
+        'question': question.pk,
+        'answers': 6,
+        'distinct': 3,
+        'top': [{'answer': 'yes', 'count': 3}, {'answer': 'no idea', 'count': 2}],
+    }
+    # Question, archive check, count of answers
+    with django_assert_num_queries(3):
+        cached = api_client_as_admin.get(url, data={'top': 2})
+    assert cached.data == response.data
+    # Answer saved by other worker changes count of answers without local invalidation
+    with mock.patch('polls.summaries.invalidate'):
+        response = api_client.post(
+            reverse('answers-list'),
+            data=json.dumps({'user_id': 8, 'question': question.pk, 'answer': 'Yes!'}),
+            content_type='application/json'
+        )
+    assert response.status_code == status.HTTP_201_CREATED
+    assert api_client_as_admin.get(url, data={'top': 2}).data['answers'] == 7
+    response = api_client.post(
+        reverse('answers-list'),
+        data=json.dumps({'user_id': 7, 'question': question.pk, 'answer': 'MAYBE'}),
+        content_type='application/json'
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+    response = api_client_as_admin.get(url)
+    assert response.data['answers'] == 8
+    assert {'answer': 'maybe', 'count': 2} in response.data['top']
+
+
+@pytest.mark.django_db
+def test_summary_version(api_client, api_client_as_admin):
+    question = QuestionsFactory.create(type='TX')
+    version_key = f'question_summary:{question.pk}:version'
+    response = api_client.post(
+        reverse('answers-list'),
+        data=json.dumps({'user_id': 1, 'question': question.pk, 'answer': 'Yes'}),
+        content_type='application/json'
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+    # New answer changes count of answers, version isn't written
+    assert cache.get(version_key) is None
+    url = reverse(f'{base_url}-summary', kwargs={'pk': question.pk})
+    assert api_client_as_admin.get(url).data['top'] == [{'answer': 'yes', 'count': 1}]
+    version = cache.get(version_key)
+    answer_url = reverse('answers-detail', kwargs={'pk': response.data['id']})
+    data = {'user_id': 1, 'question': question.pk, 'answer': ' YES '}
+    response = api_client.put(answer_url, data=json.dumps(data), content_type='application/json')
+    assert response.status_code == status.HTTP_200_OK
+    assert cache.get(version_key) == version
+    data['answer'] = 'No'
+    response = api_client.put(answer_url, data=json.dumps(data), content_type='application/json')
+    assert response.status_code == status.HTTP_200_OK
+    assert cache.get(version_key) != version
+    assert api_client_as_admin.get(url).data['top'] == [{'answer': 'no', 'count': 1}]
+
+
+@pytest.mark.django_db
+def test_summary_invalid(api_client_as_admin):
+    question = QuestionsFactory.create(type='TX')
+    url = reverse(f'{base_url}-summary', kwargs={'pk': question.pk})
+    assert APIClient().get(url).status_code == status.HTTP_401_UNAUTHORIZED
+    assert api_client_as_admin.get(url, data={'top': 0}).status_code == status.HTTP_400_BAD_REQUEST
+    option_question = QuestionsFactory.create(type='SO')
+    url = reverse(f'{base_url}-summary', kwargs={'pk': option_question.pk})
+    assert api_client_as_admin.get(url).status_code == status.HTTP_400_BAD_REQUEST
@@ -0,0 +1,54 @@
+import io
+import json
+from datetime import date
+from datetime import datetime as dt
+from decimal import Decimal
+
+import pytest
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from polls import renderers
+from polls.parsers import FastJSONParser
+from polls.renderers import FastJSONRenderer
+
+
+@pytest.mark.parametrize('data', [
+    {'id': 1, 'text': 'Вопрос "1"\n\t\\', 'separators': '\u2028\u2029', 'emoji': '\U0001f600'},
+    [{'value': 0.1, 'float': 1.5, 'big': 2 ** 62, 'none': None, 'flag': True}, [], {}],
+    {1: 'int key', 'date': date(2021, 3, 1), 'datetime': dt(2021, 3, 1, 12, 30, 15, 123456), 'decimal': Decimal('1.50')},
+    {'huge': 2 ** 70},
+])
+def test_fast_json_renderer(data):
+    assert FastJSONRenderer().render(data) == JSONRenderer().render(data)
+    indented = FastJSONRenderer().render(data, 'application/json; indent=4')
+    assert indented == JSONRenderer().render(data, 'application/json; indent=4')
+
+
+def test_fast_json_parser():
+    content = '{"user_id": 1, "answer": "Ответ \\u2028", "values": [1.5, null]}'.encode()
+    assert FastJSONParser().parse(io.BytesIO(content)) == JSONParser().parse(io.BytesIO(content))
+    with pytest.raises(ParseError):
+        FastJSONParser().parse(io.BytesIO(b'{"user_id": '))
+
+
+@pytest.mark.skipif(renderers.orjson is None, reason='orjson is not installed')
+@pytest.mark.parametrize('value, rendered', [
+    (1e16, b'1e16'),
+    (1e-7, b'1e-7'),
+    (2.5e-5, b'0.000025'),
+    (-0.0, b'-0.0'),
+])
+def test_fast_json_renderer_floats(value, rendered):
+    # Floats are written in other form, but parsed to the same values
+    assert FastJSONRenderer().render([value]) == b'[' + rendered + b']'
+    assert json.loads(FastJSONRenderer().render([value])) == json.loads(JSONRenderer().render([value]))
+
+
+@pytest.mark.skipif(renderers.orjson is None, reason='orjson is not installed')
+def test_fast_json_renderer_nan():
+    with pytest.raises(ValueError):
+        JSONRenderer().render([float('nan')])
+    assert FastJSONRenderer().render([float('nan'), float('inf')]) == b'[null,null]'
@@ -0,0 +1,108 @@
+import json
+
+import pytest
+
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+
+from polls import db_routers
+
+from .factories import QuestionsFactory
+
+
+def test_read_database(settings):
+    settings.DATABASE_REPLICAS = ['replica1']
+    assert db_routers.read_database() == 'default'
+    token = db_routers.use_replica.set(True)
+    try:
+        assert db_routers.read_database() == 'replica1'
+        with db_routers.primary():
+            assert db_routers.read_database() == 'default'
+        assert db_routers.ReplicaRouter().db_for_write(None) == 'default'
+    finally:
+        db_routers.use_replica.reset(token)
+
+
+@pytest.fixture
+def reads(settings, monkeypatch):
+    # Primary stands in for the replica, routing decisions of reads are recorded
+    settings.DATABASE_REPLICAS = ['default']
+    recorded = []
+    monkeypatch.setattr(
+        db_routers.ReplicaRouter, 'db_for_read',
+        lambda self, model, **hints: recorded.append(db_routers.use_replica.get()) or 'default'
+    )
+    return recorded
+
+
+@pytest.mark.django_db
+def test_reads_from_replica(api_client, reads):
+    question = QuestionsFactory.create()
+    reads.clear()
+    response = api_client.get(reverse('questions-list'))
+    assert response.status_code == status.HTTP_200_OK
+    assert reads and all(reads)
+    reads.clear()
+    response = api_client.post(
+        reverse('answers-list'),
+        data=json.dumps({'user_id': 1, 'question': question.pk, 'answer': 'Text'}),
+        content_type='application/json'
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+    assert not any(reads)
+    assert db_routers.use_replica.get() is False
+
+
+@pytest.mark.django_db
+def test_pinned_to_primary_after_write(api_client, reads):
+    question = QuestionsFactory.create()
+    response = api_client.post(
+        reverse('answers-list'),
+        data=json.dumps({'user_id': 1, 'question': question.pk, 'answer': 'Text'}),
+        content_type='application/json'
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+    reads.clear()
+    response = api_client.get(reverse('answers-list'), data={'user_id': 1})
+    assert len(response.data['results']) == 1
+    assert reads and not any(reads)
+    reads.clear()
+    api_client.get(reverse('answers-list'), data={'user_id': 2})
+    assert reads and all(reads)
+
+
+def connection_queries(request):
+    # Runs request, returns the numbers of queries of the primary and replica connections
+    with CaptureQueriesContext(connections['default']) as primary:
+        with CaptureQueriesContext(connections['replica']) as replica:
+            response = request()
+    return response, len(primary), len(replica)
+
+
+@pytest.mark.django_db(transaction=True, databases=['default', 'replica'])
+def test_replica_connection(api_client, settings):
+    settings.DATABASE_REPLICAS = ['replica']
+    question = QuestionsFactory.create()
+    response, primary, replica = connection_queries(lambda: api_client.get(reverse('questions-list')))
+    assert [item['id'] for item in response.data['results']] == [question.pk]
+    assert primary == 0 and replica > 0
+    response, primary, replica = connection_queries(lambda: api_client.post(
+        reverse('answers-list'),
+        data=json.dumps({'user_id': 1, 'question': question.pk, 'answer': 'Text'}),
+        content_type='application/json'
+    ))
+    assert response.status_code == status.HTTP_201_CREATED
+    assert primary > 0 and replica == 0
+    response, primary, replica = connection_queries(
+        lambda: api_client.get(reverse('answers-list'), data={'user_id': 1})
+    )
+    assert len(response.data['results']) == 1
+    assert primary > 0 and replica == 0
+    response, primary, replica = connection_queries(
+        lambda: api_client.get(reverse('answers-list'), data={'user_id': 2})
+    )
+    assert response.data['results'] == []
+    assert primary == 0 and replica > 0
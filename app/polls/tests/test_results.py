@@ -0,0 +1,216 @@
+import json
+
+import pytest
+
+from django.core.management import call_command
+from django.urls import reverse
+
+from rest_framework import status
+
+from polls.models import Answer
+from polls.models import ArchivedAnswer
+from polls.models import OptionTally
+from polls.models import PollStats
+from polls.models import QuestionTally
+
+from .factories import AnswersFactory
+from .factories import PollsFactory
+from .factories import QuestionsFactory
+
+
+def results(api_client, poll):
+    response = api_client.get(reverse('polls-results', kwargs={'pk': poll.pk}))
+    assert response.status_code == status.HTTP_200_OK
+    return {item['id']: (item['responses'], item['options']) for item in response.data['questions']}
+
+
+def post_answers(api_client, data):
+    response = api_client.post(reverse('answers-bulk'), data=json.dumps(data), content_type='application/json')
+    assert response.status_code == status.HTTP_201_CREATED
+    return response.data
+
+
+@pytest.mark.django_db
+def test_results_counted_on_create(api_client):
+    poll = PollsFactory.create(start_date='2020-01-01', end_date='2100-01-01')
+    tx, so, mo = [QuestionsFactory.create(poll=poll, type=type) for type in ('TX', 'SO', 'MO')]
+    post_answers(api_client, [
+        {'user_id': 1, 'question': tx.pk, 'answer': 'Text'},
+        {'user_id': 1, 'question': so.pk, 'answer': '1'},
+        {'user_id': 1, 'question': mo.pk, 'answer': '1 3'},
+        {'user_id': 2, 'question': so.pk, 'answer': '2'},
+        {'user_id': 2, 'question': mo.pk, 'answer': '3 3 4'},
+    ])
+    response = api_client.post(
+        reverse('answers-list'),
+        data=json.dumps({'user_id': 3, 'question': so.pk, 'answer': '1'}),
+        content_type='application/json'
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+    assert results(api_client, poll) == {
+        tx.pk: (1, {}),
+        so.pk: (3, {'1': 2, '2': 1}),
+        mo.pk: (2, {'1': 1, '3': 2, '4': 1}),
+    }
+
+
+@pytest.mark.django_db
+def test_results_counted_on_update_and_delete(api_client, api_client_as_admin):
+    poll = PollsFactory.create(start_date='2020-01-01', end_date='2100-01-01')
+    question = QuestionsFactory.create(poll=poll, type='MO')
+    post_answers(api_client, [
+        {'user_id': 1, 'question': question.pk, 'answer': '1 2'},
+        {'user_id': 2, 'question': question.pk, 'answer': '2'},
+    ])
+    pk = question.answers.get(user_id=1).pk
+    response = api_client.put(
+        reverse('answers-detail', kwargs={'pk': pk}),
+        data=json.dumps({'id': pk, 'user_id': 1, 'question': question.pk, 'answer': '2 3'}),
+        content_type='application/json'
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert results(api_client, poll) == {question.pk: (2, {'1': 0, '2': 2, '3': 1})}
+    response = api_client_as_admin.delete(reverse('answers-detail', kwargs={'pk': pk}))
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    assert results(api_client, poll) == {question.pk: (1, {'1': 0, '2': 1, '3': 0})}
+
+
+@pytest.mark.django_db
+def test_results_query_count(api_client, django_assert_num_queries):
+    poll = PollsFactory.create(start_date='2020-01-01', end_date='2100-01-01')
+    for type in ('TX', 'SO', 'MO', 'MO'):
+        question = QuestionsFactory.create(poll=poll, type=type)
+        AnswersFactory.create(question=question, answer='1')
+    call_command('rebuild_tallies')
+    # Poll, archive, questions with tallies and option tallies
+    with django_assert_num_queries(4):
+        results(api_client, poll)
+
+
+@pytest.mark.django_db
+def test_rebuild_tallies(api_client):
+    poll = PollsFactory.create(start_date='2020-01-01', end_date='2100-01-01')
+    so, mo = [QuestionsFactory.create(poll=poll, type=type) for type in ('SO', 'MO')]
+    post_answers(api_client, [
+        {'user_id': 1, 'question': so.pk, 'answer': '1'},
+        {'user_id': 1, 'question': mo.pk, 'answer': '1 3'},
+    ])
+    expected = results(api_client, poll)
+    OptionTally.objects.all().delete()
+    QuestionTally.objects.update(responses=0)
+    call_command('rebuild_tallies', poll.pk)
+    assert results(api_client, poll) == expected
+
+
+def stats(api_client_as_admin, poll):
+    response = api_client_as_admin.get(reverse('polls-stats', kwargs={'pk': poll.pk}))
+    assert response.status_code == status.HTTP_200_OK
+    return response.data
+
+
+@pytest.mark.django_db
+def test_stats_counted_on_answer_writes(api_client, api_client_as_admin):
+    poll = PollsFactory.create(start_date='2020-01-01', end_date='2100-01-01')
+    tx, so = [QuestionsFactory.create(poll=poll, type=type) for type in ('TX', 'SO')]
+    post_answers(api_client, [
+        {'user_id': 1, 'question': tx.pk, 'answer': 'Text'},
+        {'user_id': 1, 'question': so.pk, 'answer': '1'},
+        {'user_id': 2, 'question': so.pk, 'answer': '2'},
+    ])
+    assert stats(api_client_as_admin, poll) == {
+        'poll': poll.pk, 'respondents': 2, 'completions': 1, 'questions': {str(tx.pk): 1, str(so.pk): 2},
+    }
+    response = api_client.post(
+        reverse('answers-list'),
+        data=json.dumps({'user_id': 2, 'question': tx.pk, 'answer': 'Text'}),
+        content_type='application/json'
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+    assert stats(api_client_as_admin, poll)['completions'] == 2
+    pk = so.answers.get(user_id=1).pk
+    response = api_client_as_admin.delete(reverse('answers-detail', kwargs={'pk': pk}))
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    pk = tx.answers.get(user_id=1).pk
+    response = api_client_as_admin.delete(reverse('answers-detail', kwargs={'pk': pk}))
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    assert stats(api_client_as_admin, poll) == {
+        'poll': poll.pk, 'respondents': 1, 'completions': 1, 'questions': {str(tx.pk): 1, str(so.pk): 1},
+    }
+
+
+@pytest.mark.django_db
+def test_stats_query_count(api_client, api_client_as_admin, django_assert_num_queries):
+    poll = PollsFactory.create(start_date='2020-01-01', end_date='2100-01-01')
+    questions = QuestionsFactory.create_batch(3, poll=poll, type='TX')
+    post_answers(api_client, [
+        {'user_id': 1, 'question': questions[0].pk, 'answer': 'Text'},
+        {'user_id': 2, 'question': questions[1].pk, 'answer': 'Text'},
+        {'user_id': 2, 'question': questions[2].pk, 'answer': 'Text'},
+    ])
+    data = {'user_id': 1, 'question': questions[1].pk, 'answer': 'Text'}
+    # Answer insert, question tally update, participation read and update, savepoints. Statistics
+    # don't change and number of questions of the poll is taken from question cache
+    with django_assert_num_queries(6):
+        response = api_client.post(reverse('answers-list'), data=json.dumps(data), content_type='application/json')
+    assert response.status_code == status.HTTP_201_CREATED
+    # Added question is counted by completions, though other questions of the poll are cached
+    QuestionsFactory.create(poll=poll, type='TX')
+    post_answers(api_client, [{'user_id': 1, 'question': questions[2].pk, 'answer': 'Text'}])
+    assert stats(api_client_as_admin, poll)['completions'] == 0
+
+
+@pytest.mark.django_db
+def test_stats_admin_only(api_client):
+    poll = PollsFactory.create(start_date='2020-01-01', end_date='2100-01-01')
+    response = api_client.get(reverse('polls-stats', kwargs={'pk': poll.pk}))
+    assert response.status_code in (status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN)
+
+
+@pytest.mark.django_db
+def test_reconcile_poll_stats(api_client, api_client_as_admin):
+    poll = PollsFactory.create(start_date='2020-01-01', end_date='2100-01-01')
+    question = QuestionsFactory.create(poll=poll, type='TX')
+    post_answers(api_client, [{'user_id': 1, 'question': question.pk, 'answer': 'Text'}])
+    expected = stats(api_client_as_admin, poll)
+    PollStats.objects.update(respondents=5, completions=0)
+    call_command('reconcile_poll_stats', poll.pk)
+    assert stats(api_client_as_admin, poll)['respondents'] == 5
+    call_command('reconcile_poll_stats', poll.pk, fix=True)
+    assert stats(api_client_as_admin, poll) == expected
+
+
+@pytest.mark.django_db
+def test_archive_polls(api_client, api_client_as_admin):
+    closed = PollsFactory.create(start_date='2020-01-01', end_date='2020-02-01')
+    open_poll = PollsFactory.create(start_date='2020-01-01', end_date='2100-01-01')
+    tx, so = [QuestionsFactory.create(poll=closed, type=type) for type in ('TX', 'SO')]
+    question = QuestionsFactory.create(poll=open_poll, type='TX')
+    post_answers(api_client, [
+        {'user_id': 1, 'question': tx.pk, 'answer': 'Text'},
+        {'user_id': 1, 'question': so.pk, 'answer': '2'},
+        {'user_id': 2, 'question': so.pk, 'answer': '2'},
+        {'user_id': 1, 'question': question.pk, 'answer': 'Text'},
+    ])
+    expected = results(api_client, closed)
+    call_command('archive_polls', before='2021-01-01')
+    assert list(Answer.objects.values_list('question', flat=True)) == [question.pk]
+    assert ArchivedAnswer.objects.filter(poll=closed).count() == 3
+    assert closed.archive.answers == 3
+    assert results(api_client, closed) == expected
+    call_command('rebuild_tallies')
+    call_command('reconcile_poll_stats', fix=True)
+    assert results(api_client, closed) == expected
+    assert stats(api_client_as_admin, closed)['respondents'] == 2
+
+    response = api_client.post(
+        reverse('answers-list'),
+        data=json.dumps({'user_id': 3, 'question': tx.pk, 'answer': 'Text'}),
+        content_type='application/json'
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    response = api_client_as_admin.get(reverse('polls-export', kwargs={'pk': closed.pk}), {'format': 'ndjson'})
+    assert response.status_code == status.HTTP_200_OK
+    rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+    assert [(row['user_id'], row['question'], row['answer']) for row in rows] == [
+        (1, tx.pk, 'Text'), (1, so.pk, '2'), (2, so.pk, '2'),
+    ]
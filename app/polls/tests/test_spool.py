@@ -0,0 +1,100 @@
+import json
+
+import pytest
+
+from django.core.management import call_command
+from django.urls import reverse
+
+from rest_framework import status
+
+from polls.models import Answer
+from polls.serializers import AnswerSerializer
+
+from .factories import QuestionsFactory
+
+base_url = 'answers'
+
+
+@pytest.fixture
+def spool_mode(settings, tmp_path):
+    settings.ANSWERS_INGEST_MODE = 'spool'
+    settings.ANSWERS_SPOOL_PATH = str(tmp_path / 'spool.sqlite3')
+
+
+def submit(api_client, data):
+    return api_client.post(reverse(f'{base_url}-list'), data=json.dumps(data), content_type='application/json')
+
+
+@pytest.mark.django_db
+def test_submit_and_drain(api_client, spool_mode):
+    question = QuestionsFactory.create(type='SO')
+    response = submit(api_client, {'user_id': 1, 'question': question.pk, 'answer': '1'})
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    assert response.data['status'] == 'pending'
+    assert Answer.objects.count() == 0
+    url = response['Location']
+    assert api_client.get(url).data['status'] == 'pending'
+
+    call_command('drain_answers', once=True)
+    response = api_client.get(url)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data['status'] == 'created'
+    assert response.data['answer'] == AnswerSerializer(Answer.objects.get()).data
+
+
+@pytest.mark.django_db
+def test_submit_invalid(api_client, spool_mode):
+    question = QuestionsFactory.create(type='SO')
+    response = submit(api_client, {'user_id': 1, 'question': question.pk, 'answer': 'Text'})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+def test_drain_rejects_duplicates(api_client, spool_mode):
+    question = QuestionsFactory.create()
+    urls = [
+        submit(api_client, {'user_id': 1, 'question': question.pk, 'answer': answer})['Location']
+        for answer in ('First', 'Second')
+    ]
+    call_command('drain_answers', once=True, batch_size=1)
+    assert [api_client.get(url).data['status'] for url in urls] == ['created', 'rejected']
+    assert Answer.objects.get().answer == 'First'
+
+
+@pytest.mark.django_db
+def test_submission_not_found(api_client, spool_mode):
+    url = reverse(f'{base_url}-submission', kwargs={'submission_id': '0' * 32})
+    assert api_client.get(url).status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+def test_drain_repeated_submissions(api_client, spool_mode):
+    question = QuestionsFactory.create()
+    data = {'user_id': 1, 'question': question.pk, 'answer': 'Answer'}
+    urls = [submit(api_client, data)['Location'] for _ in range(2)]
+    call_command('drain_answers', once=True)
+    urls.append(submit(api_client, data)['Location'])
+    call_command('drain_answers', once=True)
+    expected = AnswerSerializer(Answer.objects.get()).data
+    for url in urls:
+        response = api_client.get(url)
+        assert response.data['status'] == 'created'
+        assert response.data['answer'] == expected
+
+
+@pytest.mark.django_db
+def test_submit_async(api_client, spool_mode):
+    question = QuestionsFactory.create(type='SO')
+    url = reverse(f'{base_url}-async')
+    data = {'user_id': 1, 'question': question.pk, 'answer': 'Text'}
+    response = api_client.post(url, data=json.dumps(data), content_type='application/json')
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    data['answer'] = '1'
+    response = api_client.post(url, data=json.dumps(data), content_type='application/json')
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    assert response.json()['status'] == 'pending'
+    assert Answer.objects.count() == 0
+
+    call_command('drain_answers', once=True)
+    assert api_client.get(response['Location']).data['status'] == 'created'
+    assert Answer.objects.get().answer == '1'
@@ -0,0 +1,210 @@
+import asyncio
+import json
+import time
+from unittest import mock
+
+import pytest
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.urls import resolve
+from django.urls import reverse
+from django.test import AsyncClient
+from django.test import override_settings
+
+from rest_framework import status
+
+from polls import throttling
+from polls.models import Question
+from polls.throttling import ConcurrencyLimitMiddleware
+
+from .factories import QuestionsFactory
+
+
+base_url = 'answers'
+
+
+def post_answer(api_client, question, user_id, **extra):
+    data = {'user_id': user_id, 'question': question.pk, 'answer': 'Answer'}
+    return api_client.post(reverse(f'{base_url}-list'), data=json.dumps(data), content_type='application/json', **extra)
+
+
+def active_requests(route):
+    window = int(time.time() // settings.CONCURRENCY_COUNTER_TTL)
+    return sum(cache.get(throttling.counter_key(route, window - shift), 0) for shift in (0, 1))
+
+
+# ===================== RATE LIMITS ===================== #
+
+@pytest.mark.django_db
+@override_settings(THROTTLE_RATES={'answers-list': {'user_id': (0.01, 2)}})
+def test_throttle_by_user_id(api_client):
+    questions = QuestionsFactory.create_batch(4, type=Question.TEXT)
+    assert post_answer(api_client, questions[0], 1).status_code == status.HTTP_201_CREATED
+    assert post_answer(api_client, questions[1], 1).status_code == status.HTTP_201_CREATED
+    response = post_answer(api_client, questions[2], 1)
+    assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+    assert int(response['Retry-After']) > 0
+    # Other users have their own buckets, reads are not limited
+    assert post_answer(api_client, questions[2], 2).status_code == status.HTTP_201_CREATED
+    response = api_client.get(reverse(f'{base_url}-list'), {'user_id': 1})
+    assert response.status_code == status.HTTP_200_OK
+
+
+@pytest.mark.django_db
+@override_settings(THROTTLE_RATES={'answers-list': {'ip': (0.01, 1)}})
+def test_throttle_by_ip(api_client):
+    question = QuestionsFactory.create(type=Question.TEXT)
+    assert post_answer(api_client, question, 1, REMOTE_ADDR='10.0.0.1').status_code == status.HTTP_201_CREATED
+    response = post_answer(api_client, question, 2, REMOTE_ADDR='10.0.0.1')
+    assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+    assert post_answer(api_client, question, 2, REMOTE_ADDR='10.0.0.2').status_code == status.HTTP_201_CREATED
+
+
+@pytest.mark.django_db
+@override_settings(THROTTLE_RATES={'answers-list': {'ip': (0.01, 1)}})
+def test_throttle_by_ip_behind_proxy(api_client):
+    question = QuestionsFactory.create(type=Question.TEXT)
+    # Client can't get new bucket by sending X-Forwarded-For, nginx appends its address
+    response = post_answer(api_client, question, 1, HTTP_X_FORWARDED_FOR='1.1.1.1, 10.0.0.1')
+    assert response.status_code == status.HTTP_201_CREATED
+    response = post_answer(api_client, question, 2, HTTP_X_FORWARDED_FOR='2.2.2.2, 10.0.0.1')
+    assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+
+
+@pytest.mark.django_db
+@override_settings(THROTTLE_RATES={'token_obtain_pair': {'ip': (0.01, 1)}})
+def test_throttle_token(api_client):
+    url = reverse('token_obtain_pair')
+    data = json.dumps({'username': 'user', 'password': 'wrong'})
+    assert api_client.post(url, data=data, content_type='application/json').status_code == \
+        status.HTTP_401_UNAUTHORIZED
+    assert api_client.post(url, data=data, content_type='application/json').status_code == \
+        status.HTTP_429_TOO_MANY_REQUESTS
+
+
+# ===================== CONCURRENCY LIMITS ===================== #
+
+@pytest.mark.django_db
+@override_settings(CONCURRENCY_LIMITS={'answers-list': 0}, CONCURRENCY_RETRY_AFTER=3)
+def test_concurrency_limit_sheds_load(api_client):
+    question = QuestionsFactory.create(type=Question.TEXT)
+    response = post_answer(api_client, question, 1)
+    assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+    assert response['Retry-After'] == '3'
+    # Other routes are not limited
+    response = api_client.get(reverse('questions-detail', kwargs={'pk': question.pk}))
+    assert response.status_code == status.HTTP_200_OK
+
+
+@pytest.mark.django_db
+@override_settings(CONCURRENCY_LIMITS={'answers-list': 1})
+def test_concurrency_limit_released(api_client):
+    question = QuestionsFactory.create(type=Question.TEXT)
+    assert post_answer(api_client, question, 1).status_code == status.HTTP_201_CREATED
+    assert post_answer(api_client, question, 2).status_code == status.HTTP_201_CREATED
+
+
+@override_settings(CONCURRENCY_LIMITS={'answers-list': 1})
+def test_concurrency_limit_in_progress(rf):
+    def post():
+        request = rf.post('/answers/')
+        request.resolver_match = resolve('/answers/')
+        return request
+
+    responses = []
+
+    def get_response(request):
+        # Handler calls view middleware after URL resolution, the second request arrives while
+        # the first one is in progress (e.g. in other worker)
+        response = middleware.process_view(request, None, (), {})
+        if response is None and not responses:
+            responses.append(middleware(post()))
+        return response or HttpResponse()
+
+    middleware = ConcurrencyLimitMiddleware(get_response)
+    assert middleware(post()).status_code == status.HTTP_200_OK
+    assert responses[0].status_code == status.HTTP_429_TOO_MANY_REQUESTS
+    assert active_requests('answers-list') == 0
+
+
+@override_settings(CONCURRENCY_LIMITS={'answers-list': 2}, CONCURRENCY_COUNTER_TTL=60)
+def test_concurrency_counter_windows():
+    with mock.patch('time.time', return_value=60 * 1000.5):
+        old = throttling.acquire('answers-list')
+    with mock.patch('time.time', return_value=60 * 1001.5):
+        # Requests of the previous window are still counted
+        new = throttling.acquire('answers-list')
+        assert throttling.acquire('answers-list') is False
+        throttling.release(old)
+        assert throttling.acquire('answers-list')
+    # Counter of the old window expired while its request was in progress, release doesn't recreate it
+    cache.delete(old)
+    throttling.release(old)
+    assert cache.get(old) is None
+    # Counter evicted and created again by newer requests isn't decreased below zero
+    cache.set(new, 0)
+    throttling.release(new)
+    assert cache.get(new) == 0
+
+
+# ===================== ASYNC ENDPOINT ===================== #
+
+def post_async(count, save_answers):
+    async def submit():
+        client = AsyncClient()
+        return await asyncio.gather(*[
+            client.post(reverse('answers-async'), {'user_id': user_id, 'question': 1, 'answer': 'Answer'},
+                        content_type='application/json')
+            for user_id in range(count)
+        ])
+
+    with mock.patch('polls.batching.save_answers', save_answers):
+        return async_to_sync(submit)()
+
+
+@pytest.mark.django_db
+@override_settings(ASYNC_ANSWERS_BATCH_DELAY=0.2)
+def test_async_requests_batched():
+    batches = []
+
+    def save_answers(items):
+        batches.append(len(items))
+        return [(status.HTTP_201_CREATED, item) for item in items]
+
+    responses = post_async(20, save_answers)
+    assert [response.status_code for response in responses] == [status.HTTP_201_CREATED] * 20
+    assert batches == [20]
+
+
+@pytest.mark.django_db
+@override_settings(ASYNC_ANSWERS_BATCH_DELAY=0.2, CONCURRENCY_LIMITS={'answers-async': 5})
+def test_async_concurrency_limit():
+    batches = []
+
+    def save_answers(items):
+        batches.append(len(items))
+        return [(status.HTTP_201_CREATED, item) for item in items]
+
+    responses = post_async(20, save_answers)
+    codes = [response.status_code for response in responses]
+    assert codes.count(status.HTTP_201_CREATED) == 5
+    assert codes.count(status.HTTP_429_TOO_MANY_REQUESTS) == 15
+    assert batches == [5]
+    assert active_requests('answers-async') == 0
+
+
+@pytest.mark.django_db
+@override_settings(THROTTLE_RATES={'answers-async': {'user_id': (0.01, 1)}})
+def test_async_throttle(api_client):
+    question = QuestionsFactory.create(type=Question.TEXT)
+    url = reverse('answers-async')
+    data = {'user_id': 1, 'question': question.pk, 'answer': 'Answer'}
+    assert api_client.post(url, data=json.dumps(data), content_type='application/json').status_code == \
+        status.HTTP_201_CREATED
+    data['question'] = QuestionsFactory.create(type=Question.TEXT).pk
+    response = api_client.post(url, data=json.dumps(data), content_type='application/json')
+    assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+    assert int(response['Retry-After']) > 0
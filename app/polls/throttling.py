@@ -0,0 +1,209 @@
+"""
+Rate limiting and admission control by resolved route name.
+
+Throttles keep token buckets (`THROTTLE_RATES`) per route and client in the default cache.
+`ConcurrencyLimitMiddleware` bounds number of concurrent requests of a route (`CONCURRENCY_LIMITS`)
+and sheds the excess with 429 before it queues for the database.
+"""
+import math
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.http import JsonResponse
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.request import Request
+from rest_framework.throttling import BaseThrottle
+
+from .middleware import HybridMiddleware
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Allows `rate` requests per second with bursts up to `burst` requests for each client of a route,
+    (rate, burst) are set by `THROTTLE_RATES[route name][scope]`. Only writes are limited, reads are
+    served from caches and replicas. Buckets are read and written without lock, so concurrent requests
+    of the same client can slightly exceed the limit.
+    """
+    scope = None
+
+    def __init__(self):
+        self.wait_seconds = None
+
+    def get_client(self, request, data):
+        raise NotImplementedError('.get_client() must be overridden')
+
+    def allow_request(self, request, view):
+        if request.method in SAFE_METHODS:
+            return True
+        return self.allow(request, request.data)
+
+    # Checks request of DRF or plain Django view with parsed body `data`
+    def allow(self, request, data):
+        match = request.resolver_match
+        rate = settings.THROTTLE_RATES.get(match.url_name if match else None, {}).get(self.scope)
+        if rate is None:
+            return True
+        client = self.get_client(request, data)
+        if client is None:
+            return True
+        per_second, burst = rate
+        key = f'throttle:{match.url_name}:{self.scope}:{client}'
+        now = time.time()
+        tokens, updated = cache.get(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated) * per_second)
+        if tokens < 1:
+            self.wait_seconds = (1 - tokens) / per_second
+            return False
+        # Bucket expires when it would be full again
+        cache.set(key, (tokens - 1, now), timeout=math.ceil(burst / per_second) + 1)
+        return True
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class UserIdRateThrottle(TokenBucketThrottle):
+    """
+    Buckets by `user_id` of the answer (the first one of bulk request) or authenticated user.
+    """
+    scope = 'user_id'
+
+    def get_client(self, request, data):
+        if isinstance(data, list):
+            data = data[0] if data else None
+        user_id = data.get('user_id') if isinstance(data, dict) else None
+        if user_id is not None:
+            return f'user_id:{user_id}'
+        # User of plain Django request is not authenticated by JWT
+        if isinstance(request, Request) and request.user and request.user.is_authenticated:
+            return f'user:{request.user.pk}'
+        return None
+
+
+class IPRateThrottle(TokenBucketThrottle):
+    """
+    Buckets by client IP address, `NUM_PROXIES` setting of DRF is number of proxies in front of the app.
+    """
+    scope = 'ip'
+
+    def get_client(self, request, data):
+        return self.get_ident(request)
+
+
+def throttle_wait(request, data):
+    """
+    Applies the throttles to request of plain Django view with parsed body `data`.
+    Returns seconds to wait if the request is throttled, None otherwise.
+    """
+    waits = [
+        throttle.wait() for throttle in (UserIdRateThrottle(), IPRateThrottle()) if not throttle.allow(request, data)
+    ]
+    return max(waits) if waits else None
+
+
+def throttled_response(wait):
+    response = JsonResponse(
+        {'detail': f'Request was throttled. Expected available in {math.ceil(wait)} seconds.'}, status=429
+    )
+    response['Retry-After'] = str(math.ceil(wait))
+    return response
+
+
+def counter_key(route, window):
+    return f'concurrency:{route}:{window}'
+
+
+def acquire(route):
+    """
+    Counts request of the route in progress if the route has concurrency limit. Returns counter key
+    or None if the route isn't limited, False if the route is busy.
+    """
+    limit = settings.CONCURRENCY_LIMITS.get(route)
+    if limit is None:
+        return None
+    # Requests are counted by key of the current window, which expires after the next window, so
+    # the key is decremented by the requests which incremented it and requests of killed workers
+    # are not counted after two windows
+    window = int(time.time() // settings.CONCURRENCY_COUNTER_TTL)
+    key = counter_key(route, window)
+    try:
+        active = cache.incr(key)
+    except ValueError:
+        if cache.add(key, 1, timeout=2 * settings.CONCURRENCY_COUNTER_TTL):
+            active = 1
+        else:
+            active = cache.incr(key)
+    active += cache.get(counter_key(route, window - 1), 0)
+    if active > limit:
+        release(key)
+        return False
+    return key
+
+
+def release(key):
+    try:
+        if cache.decr(key) < 0:
+            # Counter was evicted and created again by newer requests
+            cache.incr(key)
+    except ValueError:
+        # Counter expired, its requests are not counted anymore
+        pass
+
+
+def busy_response():
+    response = JsonResponse({'detail': 'Server is busy, try again later.'}, status=429)
+    response['Retry-After'] = str(settings.CONCURRENCY_RETRY_AFTER)
+    return response
+
+
+class ConcurrencyLimitMiddleware(HybridMiddleware):
+    """
+    Responds 429 with `Retry-After` to requests of a route which has `CONCURRENCY_LIMITS[route name]`
+    requests in progress. Requests in progress are counted in the default cache, so the limit is shared
+    by all workers only with shared cache backend. Requests are counted for at most two windows of
+    `CONCURRENCY_COUNTER_TTL` seconds, so requests of killed workers don't stay counted.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        if self.is_async:
+            # Handler would run sync `process_view` in the thread shared by all requests
+            self.process_view = self.aprocess_view
+
+    def handle(self, request):
+        try:
+            return self.get_response(request)
+        finally:
+            self.release(request)
+
+    async def ahandle(self, request):
+        try:
+            return await self.get_response(request)
+        finally:
+            if getattr(request, '_concurrency_key', None):
+                # Cache is accessed in thread pool, so requests are not serialized in one thread
+                await sync_to_async(self.release, thread_sensitive=False)(request)
+
+    # Route is known after URL resolution
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        return self.admit(request, acquire(request.resolver_match.url_name))
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        key = await sync_to_async(acquire, thread_sensitive=False)(request.resolver_match.url_name)
+        return self.admit(request, key)
+
+    @staticmethod
+    def admit(request, key):
+        if key is False:
+            return busy_response()
+        request._concurrency_key = key
+        return None
+
+    @staticmethod
+    def release(request):
+        key = getattr(request, '_concurrency_key', None)
+        if key:
+            request._concurrency_key = None
+            release(key)
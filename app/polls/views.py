@@ -1,24 +1,64 @@
+import itertools
+import json
 from datetime import datetime as dt
 
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import FilteredRelation
+from django.db.models import Prefetch
 from django.db.models import Q
+from django.http import HttpResponseNotAllowed
+from django.http import JsonResponse
+from django.http import StreamingHttpResponse
 from django_filters import rest_framework as filters
 from rest_framework import permissions
 from rest_framework import serializers
+from rest_framework import status
 from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
 from rest_framework.reverse import reverse
 from rest_framework.views import APIView
-from rest_framework_simplejwt.authentication import JWTAuthentication
 
+from . import archival
+from . import caching
+from . import db_routers
+from . import idempotency
+from . import spool
+from . import summaries
+from . import tallies
+from . import throttling
+from .authentication import CachedJWTAuthentication
+from .batching import AnswerBatcher
+from .filters import AnswerFilter
+from .filters import OptionFilter
 from .filters import QuestionFilter
 from .models import Answer
+from .models import ArchivedAnswer
+from .models import Option
 from .models import Poll
+from .models import PollArchive
+from .models import PollStats
 from .models import Question
 from .permissions import DeleteProhibition
 from .permissions import ReadOnly
+from .question_cache import question_cache
+from .renderers import CSVRenderer
+from .renderers import NDJSONRenderer
 from .serializers import AnswerSerializer
+from .serializers import OptionSerializer
 from .serializers import PollSerializer
 from .serializers import QuestionSerializer
+from .serializers import get_expand
+
+# Number of answers fetched from database cursor at once on export
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_COLUMNS = ('id', 'user_id', 'question', 'question_type', 'answer')
+# Default and maximal number of the most frequent answers in question summary
+SUMMARY_TOP = 10
+SUMMARY_MAX_TOP = 100
 
 
 class ApiRoot(APIView):
@@ -32,19 +72,92 @@ class ApiRoot(APIView):
         })
 
 
-class PollsViewSet(viewsets.ModelViewSet):
+class ValuesListMixin:
+    """
+    Lists rows of `.values(*list_fields)` queryset without `ModelSerializer`. Fields must be
+    plain model fields or foreign keys rendered as pk, so output is the same as of the serializer.
+    """
+    list_fields = ()
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset()).values(*self.list_fields)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(page)
+        return Response(list(queryset))
+
+
+class ReplicaReadMixin:
+    """
+    Routes reads of safe-method requests to replicas. Client which has made a successful write
+    (identified by authenticated user and `user_id` parameter) reads from the primary
+    for `REPLICA_PIN_SECONDS`.
+    """
+    def dispatch(self, request, *args, **kwargs):
+        token = db_routers.use_replica.set(request.method in permissions.SAFE_METHODS)
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            db_routers.use_replica.reset(token)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if settings.DATABASE_REPLICAS and db_routers.use_replica.get():
+            if db_routers.is_pinned(self.get_pin_keys(request)):
+                db_routers.use_replica.set(False)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        writes = request.method not in permissions.SAFE_METHODS
+        if settings.DATABASE_REPLICAS and writes and response.status_code < 400:
+            db_routers.pin(self.get_pin_keys(request))
+        return super().finalize_response(request, response, *args, **kwargs)
+
+    def get_pin_keys(self, request):
+        keys = []
+        if request.user.is_authenticated:
+            keys.append(f'user:{request.user.pk}')
+        data = request.data if request.method not in permissions.SAFE_METHODS else {}
+        user_id = request.query_params.get('user_id', data.get('user_id') if isinstance(data, dict) else None)
+        if user_id is not None:
+            keys.append(f'user_id:{user_id}')
+        return keys
+
+
+class PollsViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     """
     Returns a list of all *active* polls in the system.
+    Use `?expand=questions` to include questions of each poll.
     """
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [permissions.IsAdminUser | ReadOnly]
     serializer_class = PollSerializer
 
-    def get_queryset(self):
+    # Non-staff users see only active polls
+    def get_visible_polls(self):
         if self.request.user.is_staff:
             return Poll.objects.all()
-        else:
-            return Poll.objects.filter(Q(start_date__lte=dt.now().date()) & Q(end_date__gte=dt.now().date()))
+        return Poll.objects.filter(is_active=True)
+
+    def get_queryset(self):
+        queryset = self.get_visible_polls()
+        if 'questions' in get_expand(self.request):
+            queryset = queryset.prefetch_related(Prefetch('questions', queryset=Question.objects.order_by('id')))
+        return queryset
+
+    # List of active polls is the same for all non-staff users, so it's cached
+    def list(self, request, *args, **kwargs):
+        if request.user.is_staff:
+            return super().list(request, *args, **kwargs)
+        return caching.cached_response(
+            self, request, caching.ACTIVE_POLLS, lambda: super(PollsViewSet, self).list(request, *args, **kwargs)
+        )
+
+    # Poll visible to the user is revalidated by its version without rendering
+    def retrieve(self, request, *args, **kwargs):
+        return caching.conditional_response(
+            request, kwargs['pk'], lambda: super(PollsViewSet, self).retrieve(request, *args, **kwargs),
+            self.get_visible_polls()
+        )
 
     def perform_update(self, serializer):
         start_date = self.request.data.get('start_date')
@@ -53,29 +166,169 @@ class PollsViewSet(viewsets.ModelViewSet):
             if dt.fromisoformat(start_date).date() != exist_start:
                 raise serializers.ValidationError('Start date cannot be changed')
 
+    @action(detail=True)
+    def results(self, request, pk=None):
+        """
+        Returns precomputed results of the poll: count of responses for each question
+        and count of each selected option for `Single option` and `Multiple options` questions.
+        Results of archived poll are read from its archive.
+        """
+        poll = self.get_object()
+        archive = PollArchive.objects.filter(poll=poll).first()
+        questions = archive.results if archive is not None else archival.poll_results(poll)
+        return Response({'poll': poll.pk, 'questions': questions})
+
+    @action(detail=True)
+    def progress(self, request, pk=None):
+        """
+        Returns questions of the poll answered and not answered by `?user_id=U` and answers of the user.
+        Questions are read with the user's answers (live or archived) by one query.
+        """
+        user_id = request.query_params.get('user_id', '')
+        if not user_id.isdigit():
+            raise serializers.ValidationError({'user_id': 'A valid integer is required.'})
+        if not pk.isdigit():
+            raise NotFound()
+        questions = Question.objects.filter(poll=pk, poll__in=self.get_queryset()).annotate(
+            user_answer=FilteredRelation('answers', condition=Q(answers__user_id=user_id)),
+            user_archived_answer=FilteredRelation('archived_answers', condition=Q(archived_answers__user_id=user_id)),
+        )
+        rows = list(questions.order_by('id').values_list(
+            'id', 'user_answer__id', 'user_answer__answer', 'user_archived_answer__id', 'user_archived_answer__answer'
+        ))
+        if not rows:
+            # Poll without questions or not found
+            self.get_object()
+        answered = []
+        unanswered = []
+        answers = []
+        for question, answer_pk, answer, archived_pk, archived_answer in rows:
+            if answer_pk is None and archived_pk is None:
+                unanswered.append(question)
+                continue
+            answered.append(question)
+            answers.append({
+                'id': answer_pk or archived_pk,
+                'user_id': int(user_id),
+                'question': question,
+                'answer': answer if answer_pk is not None else archived_answer,
+            })
+        return Response({
+            'poll': int(pk), 'user_id': int(user_id), 'answered': answered, 'unanswered': unanswered, 'answers': answers,
+        })
+
+    @action(detail=True, permission_classes=[permissions.IsAdminUser])
+    def stats(self, request, pk=None):
+        """
+        Returns precomputed count of users answered the poll (respondents), users answered
+        all its questions (completions) and count of answers to each question.
+        """
+        poll = self.get_object()
+        stats = PollStats.objects.filter(poll=poll).first() or PollStats(poll=poll)
+        questions = poll.questions.order_by('id').values_list('id', 'tally__responses')
+        return Response({
+            'poll': poll.pk,
+            'respondents': stats.respondents,
+            'completions': stats.completions,
+            'questions': {str(pk): responses or 0 for pk, responses in questions},
+        })
+
+    @action(detail=True, permission_classes=[permissions.IsAdminUser], renderer_classes=[CSVRenderer, NDJSONRenderer])
+    def export(self, request, pk=None):
+        """
+        Streams all answers of the poll (archived ones first) as CSV (`?format=csv`) or NDJSON (`?format=ndjson`).
+        """
+        poll = self.get_object()
+        # Rows are read after the view returns, so the database is chosen now
+        database = db_routers.read_database()
+        rows = itertools.chain.from_iterable(
+            model.objects.using(database).filter(**{lookup: poll}).order_by('id').values_list(
+                'id', 'user_id', 'question', 'question__type', 'answer'
+            ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+            for model, lookup in ((ArchivedAnswer, 'poll'), (Answer, 'question__poll'))
+        )
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            renderer.stream(EXPORT_COLUMNS, rows),
+            content_type=f'{renderer.media_type}; charset={renderer.charset}'
+        )
+        response['Content-Disposition'] = f'attachment; filename="poll_{poll.pk}_answers.{renderer.format}"'
+        return response
 
-class QuestionsViewSet(viewsets.ModelViewSet):
+
+class QuestionsViewSet(ReplicaReadMixin, ValuesListMixin, viewsets.ModelViewSet):
     """
     Returns a list questions.
     """
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [permissions.IsAdminUser | ReadOnly]
 
     queryset = Question.objects.all()
     serializer_class = QuestionSerializer
+    list_fields = QuestionSerializer.Meta.fields
 
     filter_backends = (filters.DjangoFilterBackend,)
     filterset_class = QuestionFilter
 
+    # Questions of a poll (`?poll=N`) are revalidated by the poll version without rendering
+    def list(self, request, *args, **kwargs):
+        poll = request.query_params.get('poll')
+        if poll is None:
+            return super().list(request, *args, **kwargs)
+        return caching.conditional_response(
+            request, poll, lambda: super(QuestionsViewSet, self).list(request, *args, **kwargs)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        info = question_cache.get(int(kwargs['pk'])) if str(kwargs['pk']).isdigit() else None
+        if info is None:
+            return super().retrieve(request, *args, **kwargs)
+        return caching.conditional_response(
+            request, info.poll_id, lambda: super(QuestionsViewSet, self).retrieve(request, *args, **kwargs)
+        )
 
-class AnswerViewSet(viewsets.ModelViewSet):
+    @action(detail=True, permission_classes=[permissions.IsAdminUser])
+    def summary(self, request, pk=None):
+        """
+        Returns count of answers, count of distinct answers and `?top=N` (10 by default) most frequent
+        answers of `Text answer` question. Answers are compared ignoring case and extra whitespace.
+        """
+        question = self.get_object()
+        if question.type != Question.TEXT:
+            raise serializers.ValidationError('Summary is available only for `Text answer` questions')
+        top = request.query_params.get('top', str(SUMMARY_TOP))
+        if not top.isdigit() or not 1 <= int(top) <= SUMMARY_MAX_TOP:
+            raise serializers.ValidationError({'top': f'Has to be a number from 1 to {SUMMARY_MAX_TOP}'})
+        archived = PollArchive.objects.filter(poll=question.poll_id).exists()
+        return Response({'question': question.pk, **summaries.get_summary(question.pk, int(top), archived)})
+
+
+class OptionsViewSet(viewsets.ModelViewSet):
+    """
+    Returns a list of options of `Single option` and `Multiple options` questions.
+    """
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [permissions.IsAdminUser | ReadOnly]
+
+    queryset = Option.objects.all()
+    serializer_class = OptionSerializer
+
+    filter_backends = (filters.DjangoFilterBackend,)
+    filterset_class = OptionFilter
+
+
+class AnswerViewSet(ReplicaReadMixin, ValuesListMixin, viewsets.ModelViewSet):
     """
     Returns an answers list for concrete user.
     """
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [DeleteProhibition | permissions.IsAdminUser]
 
     serializer_class = AnswerSerializer
+    list_fields = AnswerSerializer.Meta.fields
+
+    filter_backends = (filters.DjangoFilterBackend,)
+    filterset_class = AnswerFilter
 
     def get_queryset(self):
         if self.request.user.is_staff:
@@ -83,3 +336,136 @@ class AnswerViewSet(viewsets.ModelViewSet):
         else:
             user_id = self.request.query_params.get('user_id', self.request.data.get('user_id'))
             return Answer.objects.filter(user_id=user_id)
+
+    # Retries with `Idempotency-Key` header get the stored response
+    def create(self, request, *args, **kwargs):
+        return idempotency.replay(request, lambda: self.create_answer(request))
+
+    # Repeated submission of the same answer returns it with 200. In `spool` ingest mode
+    # valid answer is queued and saved later by `drain_answers` command
+    def create_answer(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        if settings.ANSWERS_INGEST_MODE != 'spool':
+            self.perform_create(serializer)
+            return Response(
+                serializer.data,
+                status=status.HTTP_200_OK if serializer.replayed else status.HTTP_201_CREATED,
+                headers=self.get_success_headers(serializer.data)
+            )
+        data, headers = spool_answer(request, serializer.validated_data)
+        return Response(data, status=status.HTTP_202_ACCEPTED, headers=headers)
+
+    @action(detail=False, url_path=r'submissions/(?P<submission_id>[0-9a-f]{32})')
+    def submission(self, request, submission_id=None):
+        """
+        Returns status of answer submitted in `spool` ingest mode: `pending`, `created` (with the answer)
+        or `rejected` (with validation errors).
+        """
+        found = spool.get_spool().get(submission_id)
+        if found is None:
+            raise NotFound()
+        submission_status, result = found
+        data = {'submission_id': submission_id, 'status': submission_status}
+        if submission_status == spool.CREATED:
+            data['answer'] = result
+        elif submission_status == spool.REJECTED:
+            data['errors'] = result
+        return Response(data)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            tallies.remove_answers([instance])
+            instance.delete()
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        Creates a list of answers (e.g. all answers for a poll) in one transaction, at most
+        `ANSWERS_BULK_MAX_SIZE` answers. Retries with `Idempotency-Key` header get the stored response.
+        """
+        return idempotency.replay(request, lambda: self.create_answers(request))
+
+    def create_answers(self, request):
+        # Size is checked before validation, so one request can't lock tallies of any number of answers
+        if isinstance(request.data, list) and len(request.data) > settings.ANSWERS_BULK_MAX_SIZE:
+            raise serializers.ValidationError(
+                f'Ensure this list has no more than {settings.ANSWERS_BULK_MAX_SIZE} answers'
+            )
+        serializer = self.get_serializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+def spool_answer(request, answer):
+    """
+    Appends validated answer to spool for `drain_answers` command. Returns data and headers of `202` response.
+    """
+    submission_id = spool.get_spool().put(
+        {'user_id': answer['user_id'], 'question': answer['question'].pk, 'answer': answer['answer']}
+    )
+    location = reverse('answers-submission', kwargs={'submission_id': submission_id}, request=request)
+    return {'submission_id': submission_id, 'status': spool.PENDING}, {'Location': location}
+
+
+def spool_submission(request, data):
+    """
+    Validates answer (dict) and appends it to spool. Returns (status code, data, headers) of response.
+    """
+    serializer = AnswerSerializer(data=data)
+    if not serializer.is_valid():
+        return status.HTTP_400_BAD_REQUEST, serializer.errors, {}
+    return (status.HTTP_202_ACCEPTED, *spool_answer(request, serializer.validated_data))
+
+
+def json_response(status_code, data, headers):
+    response = JsonResponse(data, status=status_code, safe=False)
+    for name, value in headers.items():
+        response[name] = value
+    return response
+
+
+async def submit_answer(request):
+    """
+    Creates an answer without blocking a thread per request (for ASGI deployment).
+    Answers of concurrent requests are validated and saved in batches. As in `AnswerViewSet`
+    retries with `Idempotency-Key` header get the stored response and in `spool` ingest mode
+    valid answer is queued for `drain_answers` command.
+    """
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    try:
+        data = json.loads(request.body)
+    except ValueError as exc:
+        return JsonResponse({'detail': f'JSON parse error - {exc}'}, status=status.HTTP_400_BAD_REQUEST)
+    if not isinstance(data, dict):
+        return JsonResponse({'detail': 'Expected an answer object'}, status=status.HTTP_400_BAD_REQUEST)
+    # The view isn't DRF one, so rate limits of the route are checked here
+    wait = await sync_to_async(throttling.throttle_wait, thread_sensitive=False)(request, data)
+    if wait is not None:
+        return throttling.throttled_response(wait)
+    cache_key, request_fingerprint, stored = await sync_to_async(idempotency.lookup, thread_sensitive=False)(
+        request, data
+    )
+    if stored is not None:
+        return json_response(*idempotency.stored_result(stored, request_fingerprint))
+    try:
+        if settings.ANSWERS_INGEST_MODE == 'spool':
+            status_code, result, headers = await sync_to_async(spool_submission)(request, data)
+        else:
+            status_code, result = await AnswerBatcher.get().submit(data)
+            headers = {}
+    except Exception:
+        if cache_key is not None:
+            await sync_to_async(idempotency.release, thread_sensitive=False)(cache_key)
+        raise
+    if cache_key is not None:
+        await sync_to_async(idempotency.store, thread_sensitive=False)(
+            cache_key, request_fingerprint, status_code, result, headers
+        )
+    return json_response(status_code, result, headers)
+
+
+# Answers are created by anyone as in `AnswerViewSet` (`csrf_exempt` decorator doesn't support coroutines)
+submit_answer.csrf_exempt = True